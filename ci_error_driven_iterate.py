@@ -1,20 +1,49 @@
 #!/usr/bin/env python3
 
+import functools
+import hashlib
 import os
 import subprocess
 import sys
 import time
 import re
+import traceback
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Callable, Dict, List, Set, Tuple, Optional
 import xml.etree.ElementTree as ET
 
 REPO_ROOT = Path(__file__).parent
 SOURCE_PATH = os.environ.get("SOURCE_PATH", "src/main/java")
 TEST_PATH = os.environ.get("TEST_PATH", "src/test/java")
 AGENT_TEST_SRC = REPO_ROOT / TEST_PATH
+SRC_DIR = (REPO_ROOT / SOURCE_PATH).absolute()
 GUIDE_PATH = REPO_ROOT / "PROMPT_GUIDE.md"
 GEN_SCRIPT = REPO_ROOT / "generate_tests.py"
+_JTPROJECT = REPO_ROOT / "JtProject"
+# MVN_FAST=1 runs Maven offline with one reactor thread per core
+_MVN_CMD = ["mvn", "-o", "-T", "1C", "test"] if os.environ.get("MVN_FAST") == "1" else ["mvn", "test"]
+GEN_PARALLEL = max(1, int(os.environ.get("GEN_PARALLEL", "4")))
+BATCH_SIZE = max(1, int(os.environ.get("LLM_BATCH_SIZE", "4")))
+MAVEN_TAIL_LINES = 200
+MAX_ERROR_MESSAGES = 20
+MAX_ERROR_FEEDBACK_CHARS = 4000
+
+# Lines that start an error worth feeding back to the model, in priority order:
+# Maven compilation errors ("Error:  COMPILATION ERROR :"), specific Java
+# compilation errors, and Maven build failures mentioning tests/java/maven.
+# Matched against raw output bytes so only kept lines are ever decoded
+_MAVEN_ERROR_RE = re.compile(
+    rb"^(?:(?P<compilation>(?=.*Error:).*COMPILATION ERROR)"
+    rb"|.*?(?:cannot find symbol|incompatible types|constructor|method|class|interface|enum|package"
+    rb"|illegal character|reached end of file|expected)"
+    rb"|(?=.*ERROR).*(?i:test|java|maven))"
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+_IDENTIFIER_RE = re.compile(r"[A-Za-z_$][\w$]*")
+_JAVA_FILE_NAME_RE = re.compile(r"[\w$]+\.java\b")
+_BATCH_FILE_RE = re.compile(r"^[ \t]*===FILE: (.+?)===[ \t]*$", re.M)
 
 
 def run(cmd: List[str], cwd: Path = REPO_ROOT, check: bool = True) -> Tuple[int, str]:
@@ -24,66 +53,243 @@ def run(cmd: List[str], cwd: Path = REPO_ROOT, check: bool = True) -> Tuple[int,
     return proc.returncode, proc.stdout
 
 
-def run_maven_tests() -> Tuple[bool, str, List[str]]:
-    """Run Maven tests and return (success, full_output, error_messages)"""
+def run_streaming(cmd: List[str], cwd: Path, on_line: Callable[[bytes], None]) -> int:
+    """Run a command, feeding each undecoded line of combined stdout/stderr to on_line as it arrives"""
+    with subprocess.Popen(cmd, cwd=str(cwd), stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
+        for line in proc.stdout:
+            on_line(line.rstrip(b'\r\n'))
+    return proc.returncode
+
+
+def _decode_lines(lines) -> str:
+    return '\n'.join(line.decode('utf-8', 'replace') for line in lines)
+
+
+def _error_context_after(line: bytes) -> int:
+    """Return how many following lines belong to the error starting at line, or -1 if it is not an error"""
+    m = _MAVEN_ERROR_RE.match(line)
+    if m is None:
+        return -1
+    # The compilation error section usually spans multiple lines, capture more context
+    return 4 if m.lastgroup == 'compilation' else 2
+
+
+@functools.lru_cache(maxsize=None)
+def _module_dir_for(directory: Path) -> Optional[str]:
+    if directory == _JTPROJECT:
+        return "."
+    if _JTPROJECT not in directory.parents:
+        return None
+    if (directory / "pom.xml").exists():
+        return directory.relative_to(_JTPROJECT).as_posix()
+    return _module_dir_for(directory.parent)
+
+
+def _module_for(path: Path) -> Optional[str]:
+    """Return the Maven module (relative to JtProject) owning path, or None if it is outside JtProject"""
+    return _module_dir_for(path.resolve().parent)
+
+
+def maven_modules_for(paths: List[Path]) -> Set[str]:
+    """Return the modules to build with -pl, or an empty set when the whole reactor is needed"""
+    modules = set()
+    for path in paths:
+        module = _module_for(path)
+        if module is None or module == ".":
+            # Something lives in the root project (or outside it): build everything
+            return set()
+        modules.add(module)
+    return modules
+
+
+def run_maven_tests(modules: Optional[Set[str]] = None) -> Tuple[bool, str, List[str]]:
+    """Run Maven tests and return (success, output_tail, error_messages)"""
     print("🧪 Running Maven tests...")
     # Run Maven from the JtProject directory
-    jtproject_dir = REPO_ROOT / "JtProject"
-    code, output = run(["mvn", "test"], cwd=jtproject_dir, check=False)
+    # Scan the output as it streams in; only the previous line, the error
+    # windows still being filled and a bounded tail are kept in memory
+    captures = []  # [context_lines, lines_still_needed] in order of appearance
+    open_captures = []
+    previous = deque(maxlen=1)
+    tail = deque(maxlen=MAVEN_TAIL_LINES)
+    
+    def on_line(line: bytes) -> None:
+        tail.append(line)
+        still_open = []
+        for capture in open_captures:
+            capture[0].append(line)
+            capture[1] -= 1
+            if capture[1] > 0:
+                still_open.append(capture)
+        open_captures[:] = still_open
+        
+        after = _error_context_after(line)
+        if after >= 0:
+            # Capture the error line plus one line before and `after` lines following
+            capture = [list(previous) + [line], after]
+            captures.append(capture)
+            if after > 0:
+                open_captures.append(capture)
+        previous.append(line)
+    
+    cmd = _MVN_CMD
+    if modules:
+        # Only build the affected modules plus whatever they depend on
+        cmd = _MVN_CMD[:-1] + ["-pl", ",".join(sorted(modules)), "-am"] + _MVN_CMD[-1:]
+    code = run_streaming(cmd, _JTPROJECT, on_line)
     
     # Extract error messages from the output
     error_messages = []
     if code != 0:
-        # Look for specific compilation error patterns
-        lines = output.split('\n')
-        for i, line in enumerate(lines):
-            # Check for Maven compilation errors (format: "Error:  COMPILATION ERROR :")
-            if 'Error:' in line and 'COMPILATION ERROR' in line:
-                # Capture the error section (usually spans multiple lines)
-                start = max(0, i-1)
-                end = min(len(lines), i+5)  # Capture more context
-                error_context = '\n'.join(lines[start:end])
-                error_messages.append(error_context)
-            # Check for specific Java compilation errors
-            elif any(pattern in line for pattern in [
-                'cannot find symbol', 'incompatible types', 'constructor', 
-                'method', 'class', 'interface', 'enum', 'package',
-                'illegal character', 'reached end of file', 'expected'
-            ]):
-                # Capture the specific error line and context
-                start = max(0, i-1)
-                end = min(len(lines), i+3)
-                error_context = '\n'.join(lines[start:end])
-                error_messages.append(error_context)
-            # Check for Maven build failures
-            elif 'ERROR' in line and ('test' in line.lower() or 'java' in line.lower() or 'maven' in line.lower()):
-                # Capture test-related errors
-                start = max(0, i-1)
-                end = min(len(lines), i+3)
-                error_context = '\n'.join(lines[start:end])
-                error_messages.append(error_context)
-    
-    return code == 0, output, error_messages
+        error_messages = dedupe_error_messages([_decode_lines(lines) for lines, _ in captures])
+    
+    return code == 0, _decode_lines(tail), error_messages
+
+
+def dedupe_error_messages(error_messages: List[str]) -> List[str]:
+    """Collapse repeated errors, most frequent first, keeping at most MAX_ERROR_MESSAGES"""
+    # Maven repeats the same error for every reactor module and again in the summary
+    counts = {}
+    first_seen = {}
+    for error in error_messages:
+        key = _WHITESPACE_RE.sub(' ', error.strip())[:400]
+        counts[key] = counts.get(key, 0) + 1
+        first_seen.setdefault(key, error)
+    ranked = sorted(counts, key=lambda k: -counts[k])
+    return [first_seen[k] for k in ranked[:MAX_ERROR_MESSAGES]]
 
 
 def get_failing_test_files() -> List[Path]:
     """Get list of test files that are causing failures"""
     failing_tests = []
-    test_dir = AGENT_TEST_SRC
-    if test_dir.exists():
-        for test_file in test_dir.glob("**/*Test.java"):
-            failing_tests.append(test_file)
+    # Plain directory walk: scandir entries already know their type, so no
+    # pattern matching or extra stat per file
+    stack = [str(AGENT_TEST_SRC)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith("Test.java") and entry.is_file():
+                        failing_tests.append(Path(entry.path))
+        except OSError:
+            continue
     return failing_tests
 
 
-def generate_improved_test(java_file: Path, test_file: Path, error_messages: List[str]) -> bool:
-    """Generate an improved test using error feedback"""
+# Static instructions shared by the single-file and batched fix prompts
+FIX_GUIDANCE = """⚠️ COMPILATION VALIDATION REQUIRED:
+           Before generating any code, ensure it will compile by checking:
+           1. All statements end with semicolons (;)
+           2. All method calls use correct syntax
+           3. All variable declarations are complete
+           4. All imports are correct and available
+           5. TYPE SAFETY: Check field types before setting values
+              - If field is 'private int price', use setPrice(10) NOT setPrice(10.0)
+              - If field is 'private double price', use setPrice(10.0) NOT setPrice(10)
+              - If field is 'private String name', use setName("value") NOT setName(123)
+           5. All method names match exactly (case-sensitive)
+
+           MOST IMPORTANT FIXES NEEDED:
+           1. CONSTRUCTOR ERRORS: Use NO-ARGS constructor + setters for JPA entities
+              - WRONG: new Category(1, "name")
+              - CORRECT: new Category(); category.setId(1); category.setName("name")
+           2. METHOD NAMES: Use EXACT camelCase method names from the actual class
+           3. TYPE SAFETY: Use EXACT types (int, not long; String, not Object)
+              - WRONG: double value = 1.5; int id = value; (lossy conversion)
+              - CORRECT: int id = 1; or int id = (int) value; (explicit cast)
+           4. IMPORTS: Include ALL necessary imports
+           5. MOCKITO: Use proper mocking patterns for Spring Boot
+           6. DATABASE MOCKING: For Spring Boot Application tests, use @MockBean to mock database connections
+           7. NO REAL DATABASE: Never let tests connect to real databases - always mock database dependencies
+
+           SPECIFIC DATABASE MOCKING REQUIREMENTS:
+           - For JtSpringProjectApplication tests: DO NOT call SpringApplication.run() directly
+           - Use @MockBean to mock all database-related beans (sessionFactory, userDao, etc.)
+           - Use @ExtendWith(MockitoExtension.class) instead of @SpringBootTest
+           - Mock all @Autowired dependencies with @Mock
+           - Test only the main method logic, not the full Spring context"""
+
+FINAL_VALIDATION = """⚠️ FINAL COMPILATION VALIDATION: Before returning the code, verify it will compile by checking for:
+           - Missing semicolons
+           - Incorrect method calls
+           - Missing imports (CategoryRepository, CategoryService, etc.)
+           - Type conversion errors (double to int, etc.)
+           - Syntax errors
+           - TYPE SAFETY: Verify all setter calls use correct parameter types
+             * If field is 'private int price', use setPrice(10) NOT setPrice(10.0)
+             * If field is 'private double price', use setPrice(10.0) NOT setPrice(10)
+             * If field is 'private String name', use setName("value") NOT setName(123)
+           - Missing class references
+           - All imports must exist in the project
+           - All method calls must exist in the actual classes
+           - All types must match exactly (int not double, String not Object)
+           - No markdown formatting
+           
+           🚨 CRITICAL: If you cannot verify the code will compile, DO NOT generate it. Ask for clarification instead."""
+
+
+@functools.lru_cache(maxsize=512)
+def _read_cached(path: str, mtime_ns: int) -> str:
+    """Read a file once per (path, mtime); sources rarely change between iterations"""
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def file_state(java_file: Path, test_file: Path) -> Optional[Tuple[int, int, str]]:
+    """Return (source mtime, test mtime, test sha1), or None if either file is missing"""
+    try:
+        return (java_file.stat().st_mtime_ns, test_file.stat().st_mtime_ns,
+                hashlib.sha1(test_file.read_bytes()).hexdigest())
+    except OSError:
+        return None
+
+
+def build_error_index(error_messages: List[str]) -> Dict[str, List[int]]:
+    """Map every identifier and *.java file name mentioned in the errors to the indexes of those errors"""
+    index = defaultdict(list)
+    for i, error in enumerate(error_messages):
+        for name in set(_IDENTIFIER_RE.findall(error)) | set(_JAVA_FILE_NAME_RE.findall(error)):
+            index[name].append(i)
+    return index
+
+
+def relevant_errors_for(java_file: Path, test_file: Path, error_messages: List[str],
+                        error_index: Optional[Dict[str, List[int]]] = None) -> List[str]:
+    """Return the error messages that mention this source or its test (substring match, as before)"""
+    if error_index is None:
+        error_index = build_error_index(error_messages)
+    java_stem = java_file.stem
+    test_stem = test_file.stem
+    names = (
+        java_file.name, test_file.name, java_stem, test_stem,
+        # Also check for class names in the error
+        java_stem.replace('Service', ''), test_stem.replace('Test', ''),
+    )
+    hits = set()
+    for name in names:
+        if not name:
+            # An empty name is "in" every message, as with a plain substring test
+            return list(error_messages)
+        # Substring match against the distinct tokens, so an error naming
+        # CategoryRepository still counts for Category
+        for token, indexes in error_index.items():
+            if name in token:
+                hits.update(indexes)
+    return [error_messages[i] for i in sorted(hits)]
+
+
+def generate_improved_test(java_file: Path, test_file: Path, error_messages: List[str],
+                           error_feedback_full: Optional[str] = None,
+                           error_index: Optional[Dict[str, List[int]]] = None) -> bool:
+    """Generate an improved test using error feedback; error_feedback_full is the pre-joined fallback"""
     print(f"🔧 Generating improved test for {java_file} based on errors...")
     
     # Read the original Java source
     try:
-        with open(java_file, 'r') as f:
-            java_code = f.read()
+        java_code = _read_cached(str(java_file), java_file.stat().st_mtime_ns)
     except Exception as e:
         print(f"Error reading {java_file}: {e}")
         return False
@@ -92,50 +298,36 @@ def generate_improved_test(java_file: Path, test_file: Path, error_messages: Lis
     failing_test_code = ""
     if test_file.exists():
         try:
-            with open(test_file, 'r') as f:
-                failing_test_code = f.read()
+            failing_test_code = _read_cached(str(test_file), test_file.stat().st_mtime_ns)
         except Exception as e:
             print(f"Error reading {test_file}: {e}")
     
-        # Filter errors to only those relevant to this specific file
-        relevant_errors = []
-        file_name = java_file.name
-        test_file_name = test_file.name
-        java_stem = java_file.stem
-        test_stem = test_file.stem
-
-        for error in error_messages:
-            # Check if error is related to this specific file
-            if (file_name in error or 
-                test_file_name in error or 
-                java_stem in error or
-                test_stem in error or
-                # Also check for class names in the error
-                java_stem.replace('Service', '') in error or
-                test_stem.replace('Test', '') in error):
-                relevant_errors.append(error)
-
-        # If no relevant errors found, use all errors as fallback
-        if not relevant_errors:
-            print(f"⚠️ No specific errors found for {file_name}, using all errors as fallback")
-            relevant_errors = error_messages
-    
+    # Filter errors to only those relevant to this specific file
+    file_name = java_file.name
+    relevant_errors = relevant_errors_for(java_file, test_file, error_messages, error_index)
+
     # Create an enhanced prompt with error feedback
-    error_feedback = "\n".join(relevant_errors) if relevant_errors else "No specific errors captured"
+    if relevant_errors:
+        error_feedback = "\n".join(relevant_errors)
+    else:
+        # If no relevant errors found, use all errors as fallback (joined once per iteration by the caller)
+        print(f"⚠️ No specific errors found for {file_name}, using all errors as fallback")
+        relevant_errors = error_messages
+        if error_feedback_full is None:
+            error_feedback_full = "\n".join(error_messages)
+        error_feedback = error_feedback_full
     print(f"🔍 Captured {len(error_messages)} total errors, {len(relevant_errors)} relevant to {file_name}:")
     for i, msg in enumerate(relevant_errors):
         print(f"  Relevant Error {i+1}: {msg[:200]}...")
     
-    # Ensure we have the full error context for the AI
-    if not error_feedback or error_feedback == "No specific errors captured":
-        print(f"⚠️ No relevant errors found for {file_name}, using all errors as fallback")
-        error_feedback = "\n".join(error_messages)
-    
     # If still no errors, try to extract from Maven output directly
-    if not error_feedback or error_feedback == "No specific errors captured":
+    if not error_feedback:
         print(f"⚠️ Still no errors found - this is expected when tests are passing")
         error_feedback = "No errors found - tests are passing successfully"
     
+    # Keep the prompt size (and therefore latency and cost) bounded
+    error_feedback = error_feedback[:MAX_ERROR_FEEDBACK_CHARS]
+    
     # Debug: Show what the AI will receive
     print(f"🤖 AI will receive error feedback of length: {len(error_feedback)} characters")
     if len(error_feedback) > 1000:
@@ -148,37 +340,7 @@ def generate_improved_test(java_file: Path, test_file: Path, error_messages: Lis
            CRITICAL: The previous test generation failed with these specific errors:
            {error_feedback}
 
-           ⚠️ COMPILATION VALIDATION REQUIRED:
-           Before generating any code, ensure it will compile by checking:
-           1. All statements end with semicolons (;)
-           2. All method calls use correct syntax
-           3. All variable declarations are complete
-           4. All imports are correct and available
-           5. TYPE SAFETY: Check field types before setting values
-              - If field is 'private int price', use setPrice(10) NOT setPrice(10.0)
-              - If field is 'private double price', use setPrice(10.0) NOT setPrice(10)
-              - If field is 'private String name', use setName("value") NOT setName(123)
-           5. All method names match exactly (case-sensitive)
-
-           MOST IMPORTANT FIXES NEEDED:
-           1. CONSTRUCTOR ERRORS: Use NO-ARGS constructor + setters for JPA entities
-              - WRONG: new Category(1, "name")
-              - CORRECT: new Category(); category.setId(1); category.setName("name")
-           2. METHOD NAMES: Use EXACT camelCase method names from the actual class
-           3. TYPE SAFETY: Use EXACT types (int, not long; String, not Object)
-              - WRONG: double value = 1.5; int id = value; (lossy conversion)
-              - CORRECT: int id = 1; or int id = (int) value; (explicit cast)
-           4. IMPORTS: Include ALL necessary imports
-           5. MOCKITO: Use proper mocking patterns for Spring Boot
-           6. DATABASE MOCKING: For Spring Boot Application tests, use @MockBean to mock database connections
-           7. NO REAL DATABASE: Never let tests connect to real databases - always mock database dependencies
-
-           SPECIFIC DATABASE MOCKING REQUIREMENTS:
-           - For JtSpringProjectApplication tests: DO NOT call SpringApplication.run() directly
-           - Use @MockBean to mock all database-related beans (sessionFactory, userDao, etc.)
-           - Use @ExtendWith(MockitoExtension.class) instead of @SpringBootTest
-           - Mock all @Autowired dependencies with @Mock
-           - Test only the main method logic, not the full Spring context
+           {FIX_GUIDANCE}
 
            Original Java code:
            {java_code}
@@ -195,30 +357,9 @@ def generate_improved_test(java_file: Path, test_file: Path, error_messages: Lis
            - Start directly with package declaration
            - End with the closing brace of the class
            
-           ⚠️ FINAL COMPILATION VALIDATION: Before returning the code, verify it will compile by checking for:
-           - Missing semicolons
-           - Incorrect method calls
-           - Missing imports (CategoryRepository, CategoryService, etc.)
-           - Type conversion errors (double to int, etc.)
-           - Syntax errors
-           - TYPE SAFETY: Verify all setter calls use correct parameter types
-             * If field is 'private int price', use setPrice(10) NOT setPrice(10.0)
-             * If field is 'private double price', use setPrice(10.0) NOT setPrice(10)
-             * If field is 'private String name', use setName("value") NOT setName(123)
-           - Missing class references
-           - All imports must exist in the project
-           - All method calls must exist in the actual classes
-           - All types must match exactly (int not double, String not Object)
-           - No markdown formatting
-           
-           🚨 CRITICAL: If you cannot verify the code will compile, DO NOT generate it. Ask for clarification instead.
+           {FINAL_VALIDATION}
 """
     
-    # Write enhanced prompt to a temporary file
-    temp_prompt_file = REPO_ROOT / "temp_enhanced_prompt.txt"
-    with open(temp_prompt_file, 'w') as f:
-        f.write(enhanced_prompt)
-    
     try:
         # Generate improved test using the enhanced prompt directly
         print(f"🤖 Calling generate_tests.py with enhanced prompt...")
@@ -231,18 +372,135 @@ def generate_improved_test(java_file: Path, test_file: Path, error_messages: Lis
         
         print(f"🤖 Generate test success: {success}")
         
-        # Clean up temp file
-        temp_prompt_file.unlink(missing_ok=True)
-        
         return success
     except Exception as e:
         print(f"Error generating improved test: {e}")
-        import traceback
         print(f"Full traceback: {traceback.format_exc()}")
-        temp_prompt_file.unlink(missing_ok=True)
         return False
 
 
+def _batch_marker(test_file: Path) -> str:
+    try:
+        return str(test_file.relative_to(REPO_ROOT))
+    except ValueError:
+        return str(test_file)
+
+
+def generate_tests_batched(pairs: List[Tuple[Path, Path]], error_messages: List[str],
+                           error_feedback_full: Optional[str] = None,
+                           error_index: Optional[Dict[str, List[int]]] = None) -> Dict[Path, bool]:
+    """Regenerate several tests with a single LLM call, falling back to per-file calls for anything unparsed"""
+    if error_feedback_full is None:
+        error_feedback_full = "\n".join(error_messages)[:MAX_ERROR_FEEDBACK_CHARS]
+    if error_index is None:
+        error_index = build_error_index(error_messages)
+    if len(pairs) == 1:
+        java_file, test_file = pairs[0]
+        return {java_file: generate_improved_test(java_file, test_file, error_messages, error_feedback_full, error_index)}
+    
+    print(f"📦 Generating {len(pairs)} improved tests in one batch: {', '.join(jf.name for jf, _ in pairs)}")
+    
+    # Errors relevant to any file in the batch, in their original order
+    relevant = {}
+    sections = []
+    for java_file, test_file in pairs:
+        try:
+            java_code = _read_cached(str(java_file), java_file.stat().st_mtime_ns)
+        except Exception as e:
+            print(f"Error reading {java_file}: {e}")
+            continue
+        failing_test_code = ""
+        if test_file.exists():
+            try:
+                failing_test_code = _read_cached(str(test_file), test_file.stat().st_mtime_ns)
+            except Exception as e:
+                print(f"Error reading {test_file}: {e}")
+        for error in relevant_errors_for(java_file, test_file, error_messages, error_index):
+            relevant[error] = None
+        sections.append(f"""
+           ===FILE: {_batch_marker(test_file)}===
+           Original Java code:
+           {java_code}
+
+           Previous failing test (if any):
+           {failing_test_code}
+""")
+    
+    if relevant:
+        error_feedback = "\n".join(relevant)[:MAX_ERROR_FEEDBACK_CHARS]
+    else:
+        error_feedback = error_feedback_full or "No errors found - tests are passing successfully"
+    
+    batch_prompt = f"""
+           CRITICAL: The previous test generation failed with these specific errors:
+           {error_feedback}
+
+           {FIX_GUIDANCE}
+
+           You are fixing {len(sections)} test files at once. Each file is introduced by a ===FILE: <path>=== line.
+{"".join(sections)}
+           Generate a corrected test for EVERY file above that will compile without ANY errors. Focus on fixing the constructor and method name issues first, and ensure database connections are properly mocked.
+           
+           ⚠️ CRITICAL OUTPUT FORMAT:
+           - For each file, output its ===FILE: <path>=== line exactly as given, followed by ONLY the Java test code for that file
+           - Do NOT wrap code in markdown code blocks (```java ... ```)
+           - Do NOT include any markdown formatting
+           - Start each file directly with its package declaration
+           - End each file with the closing brace of the class
+           
+           {FINAL_VALIDATION}
+"""
+    
+    results = {}
+    try:
+        from generate_tests import generate_text_with_prompt, strip_markdown_code_fences
+        
+        print(f"🤖 Batch prompt length: {len(batch_prompt)} characters")
+        response = generate_text_with_prompt(batch_prompt)
+        
+        # Split the response on the file markers: [preamble, path1, code1, path2, code2, ...]
+        chunks = _BATCH_FILE_RE.split(response)
+        generated = {chunks[k].strip(): chunks[k + 1] for k in range(1, len(chunks) - 1, 2)}
+        for java_file, test_file in pairs:
+            code = strip_markdown_code_fences(generated.get(_batch_marker(test_file), ""))
+            if code:
+                test_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(test_file, 'w') as f:
+                    f.write(code)
+                results[java_file] = True
+    except Exception as e:
+        print(f"Error generating batched tests: {e}")
+        print(f"Full traceback: {traceback.format_exc()}")
+    
+    # Anything the batch did not produce is retried on its own
+    for java_file, test_file in pairs:
+        if java_file not in results:
+            print(f"⚠️ Batch response had no usable test for {java_file.name}, retrying individually")
+            results[java_file] = generate_improved_test(java_file, test_file, error_messages, error_feedback_full, error_index)
+    return results
+
+
+# Directories that never contain Maven reports; pruned from the fallback walk
+_JACOCO_SKIP_DIRS = {'.git', 'node_modules', '.idea', '.mvn', 'src'}
+
+
+def _find_jacoco(root: Path) -> List[Path]:
+    """Find the first target/site/jacoco*/jacoco.xml under root without descending into sources or build output"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        tail = Path(dirpath).parts[-3:]
+        if tail[-1] == 'target':
+            dirnames[:] = [d for d in dirnames if d == 'site']
+        elif tail[-2:] == ('target', 'site'):
+            dirnames[:] = [d for d in dirnames if d.startswith('jacoco')]
+        elif len(tail) == 3 and tail[:2] == ('target', 'site'):
+            if 'jacoco.xml' in filenames:
+                return [Path(dirpath) / 'jacoco.xml']
+            dirnames[:] = []
+        else:
+            dirnames[:] = [d for d in dirnames if d not in _JACOCO_SKIP_DIRS and not d.startswith('.')]
+    return []
+
+
 def jacoco_xml_paths() -> List[Path]:
     """Find JaCoCo XML reports"""
     # Look for test module reports first
@@ -253,36 +511,53 @@ def jacoco_xml_paths() -> List[Path]:
             return [module_path]
     
     # Fallback to any jacoco.xml
-    return list(REPO_ROOT.glob("**/target/site/jacoco*/jacoco.xml"))
+    return _find_jacoco(REPO_ROOT)
 
 
-def read_line_coverage() -> float:
-    """Read line coverage from JaCoCo XML"""
+def read_line_coverage_bp() -> int:
+    """Read line coverage from JaCoCo XML in basis points (8123 == 81.23%)"""
     paths = jacoco_xml_paths()
     if not paths:
-        return 0.0
+        return 0
     try:
-        tree = ET.parse(paths[0])
-        root = tree.getroot()
-        
-        line_counters = []
-        for counter in root.iter("counter"):
-            if counter.attrib.get("type") == "LINE":
-                line_counters.append(counter)
+        # Stream the report instead of building the whole tree; the root-level
+        # LINE counter is the last one in the document
+        last_line = None
+        for _event, elem in ET.iterparse(str(paths[0]), events=("end",)):
+            if elem.tag == "counter" and elem.get("type") == "LINE":
+                last_line = (elem.get("missed", "0"), elem.get("covered", "0"))
+            elem.clear()
         
-        if not line_counters:
-            return 0.0
+        if last_line is None:
+            return 0
             
-        counter = line_counters[-1]
-        missed = int(counter.attrib.get("missed", "0"))
-        covered = int(counter.attrib.get("covered", "0"))
+        missed = int(last_line[0])
+        covered = int(last_line[1])
         total = missed + covered
         if total == 0:
-            return 0.0
-        return round(covered * 100.0 / total, 2)
+            return 0
+        return covered * 10000 // total
     except Exception as e:
         print(f"Error reading coverage: {e}")
-        return 0.0
+        return 0
+
+
+def read_line_coverage() -> float:
+    """Read line coverage from JaCoCo XML as a percentage"""
+    return read_line_coverage_bp() / 100
+
+
+def _to_bp(percent: float) -> int:
+    return int(round(percent * 100))
+
+
+def _git_changed_java_files(*revs: str) -> List[Path]:
+    """List added/modified Java sources under SOURCE_PATH between revs; git applies both filters"""
+    _code, out = run([
+        "git", "diff", "--name-only", "-z", "--diff-filter=AMR", *revs,
+        "--", f":(glob){SOURCE_PATH}/**/*.java",
+    ])
+    return [(REPO_ROOT / f).resolve() for f in out.split("\0") if f]
 
 
 def get_all_java_files() -> List[Path]:
@@ -294,26 +569,14 @@ def get_all_java_files() -> List[Path]:
     if base_sha and head_sha:
         # Use git diff to get only changed files
         try:
-            _code, out = run(["git", "diff", "--name-only", f"{base_sha}..{head_sha}"])
-            files = [line.strip() for line in out.splitlines() if line.strip()]
-            java_files = []
-            for f in files:
-                p = (REPO_ROOT / f).resolve()
-                if p.suffix == ".java" and str(p).startswith(str(REPO_ROOT / SOURCE_PATH)):
-                    java_files.append(p)
+            java_files = _git_changed_java_files(f"{base_sha}..{head_sha}")
             print(f"🎯 Error iteration focusing on {len(java_files)} changed files only")
             return java_files
         except RuntimeError as e:
             print(f"❌ Git diff failed: {base_sha}..{head_sha} - {e}")
             try:
                 # Try HEAD~1..HEAD as fallback (should work with fetch-depth: 0)
-                _code, out = run(["git", "diff", "--name-only", "HEAD~1", "HEAD"])
-                files = [line.strip() for line in out.splitlines() if line.strip()]
-                java_files = []
-                for f in files:
-                    p = (REPO_ROOT / f).resolve()
-                    if p.suffix == ".java" and str(p).startswith(str(REPO_ROOT / SOURCE_PATH)):
-                        java_files.append(p)
+                java_files = _git_changed_java_files("HEAD~1", "HEAD")
                 print(f"🎯 Error iteration focusing on {len(java_files)} changed files only (fallback)")
                 return java_files
             except RuntimeError as e2:
@@ -327,17 +590,31 @@ def get_all_java_files() -> List[Path]:
     return []
 
 
+def select_error_targets(pairs: List[Tuple[Path, Path]], error_messages: List[str]) -> List[Tuple[Path, Path]]:
+    """Keep only the (source, test) pairs whose source or test name appears in the Maven errors"""
+    error_blob = "\n".join(error_messages)
+    return [
+        (jf, tf) for jf, tf in pairs
+        if jf.name in error_blob or tf.name in error_blob
+    ]
+
+
+@functools.lru_cache(maxsize=None)
 def derive_test_path_from_source(java_source: Path) -> Path:
     """Derive test file path from source file"""
-    rel = java_source.parts[java_source.parts.index("java") + 1 :]
-    class_name = java_source.stem + "Test"
-    return AGENT_TEST_SRC.joinpath(*rel[:-1], class_name + ".java")
+    try:
+        rel = java_source.absolute().relative_to(SRC_DIR)
+    except ValueError:
+        # Not under SOURCE_PATH (e.g. through a symlink): mirror everything after "java"
+        rel = Path(*java_source.parts[java_source.parts.index("java") + 1 :])
+    return AGENT_TEST_SRC / rel.parent / (rel.stem + "Test.java")
 
 
 def main() -> int:
     print("🔄 Starting error-driven test improvement...")
     
     threshold = float(os.environ.get("COVERAGE_THRESHOLD", "80"))
+    threshold_bp = _to_bp(threshold)
     max_iterations = int(os.environ.get("MAX_ITERATIONS", "5"))
     
     # Ensure test directory exists
@@ -351,24 +628,43 @@ def main() -> int:
     
     print(f"Found {len(all_java_files)} Java source files")
     
+    # The source -> test mapping never changes between iterations
+    pairs = [(jf, derive_test_path_from_source(jf)) for jf in all_java_files]
+    modules = maven_modules_for([path for pair in pairs for path in pair])
+    if modules:
+        print(f"📦 Limiting Maven to module(s): {', '.join(sorted(modules))}")
+    
     # Track persistent failures for smart handling
     persistent_failures = set()
     failed_files = set()
     
+    # File state after the last regeneration, and the files the model left
+    # byte-for-byte unchanged; those are not retried while they still fail
+    state: Dict[Path, Tuple[int, int, str]] = {}
+    stalled = set()
+    
+    # Result of the most recent Maven run, and whether test files changed since
+    last_success = None
+    tests_changed = True
+    
     iteration = 0
     while iteration < max_iterations:
         iteration += 1
         print(f"\n🔄 Iteration {iteration}/{max_iterations}")
         
         # Run tests to see current state
-        success, output, error_messages = run_maven_tests()
+        success, output, error_messages = run_maven_tests(modules)
+        last_success, tests_changed = success, False
+        # The full feedback block is the same for every file this iteration
+        error_feedback_full = "\n".join(error_messages)[:MAX_ERROR_FEEDBACK_CHARS]
+        error_index = build_error_index(error_messages)
         
         if success:
             print("✅ All tests passing!")
             # Check coverage
-            coverage = read_line_coverage()
-            print(f"📊 Current coverage: {coverage}%")
-            if coverage >= threshold:
+            coverage_bp = read_line_coverage_bp()
+            print(f"📊 Current coverage: {coverage_bp / 100:.2f}%")
+            if coverage_bp >= threshold_bp:
                 print(f"🎉 Coverage target {threshold}% reached!")
                 return 0
         else:
@@ -377,21 +673,72 @@ def main() -> int:
             for i, error in enumerate(error_messages[:3]):  # Show first 3 errors
                 print(f"  Error {i+1}: {error[:200]}...")
         
-        # Generate or improve tests for each source file
+        # When the build is failing, only regenerate tests for files the errors
+        # actually mention; when it is green but coverage is low, keep them all
+        targets = pairs
+        if not success:
+            targets = select_error_targets(pairs, error_messages)
+            if targets:
+                print(f"🎯 {len(targets)}/{len(pairs)} file(s) referenced by Maven errors")
+            else:
+                print("⚠️ No Maven errors reference the changed files, processing all of them")
+                targets = pairs
+            
+            # The model already returned identical bytes for these and nothing
+            # changed since, so another call would only burn budget
+            retry = []
+            for java_file, test_file in targets:
+                if java_file in stalled and state.get(java_file) == file_state(java_file, test_file):
+                    print(f"⏭️ Skipping {java_file.name}: unchanged since last attempt and still failing")
+                    persistent_failures.add(java_file.name)
+                else:
+                    retry.append((java_file, test_file))
+            targets = retry
+        
+        before = {java_file: file_state(java_file, test_file) for java_file, test_file in targets}
+        
+        # Generate or improve tests for each source file; LLM calls are
+        # network-bound, so run them on a thread pool
         improved_any = False
-        for java_file in all_java_files:
-            test_file = derive_test_path_from_source(java_file)
-            print(f"📝 Processing {java_file.name} -> {test_file.name}")
+        with ThreadPoolExecutor(max_workers=GEN_PARALLEL) as executor:
+            futures = {}
+            for java_file, test_file in targets:
+                print(f"📝 Processing {java_file.name} -> {test_file.name}")
+            # Several files share one LLM call, batches run concurrently
+            for k in range(0, len(targets), BATCH_SIZE):
+                batch = targets[k:k + BATCH_SIZE]
+                futures[executor.submit(generate_tests_batched, batch, error_messages, error_feedback_full, error_index)] = batch
             
-            # Generate improved test with error feedback
-            if generate_improved_test(java_file, test_file, error_messages):
-                print(f"✅ Generated improved test for {java_file.name}")
-                improved_any = True
-                # Remove from persistent failures if it was there
-                persistent_failures.discard(java_file.name)
-            else:
-                print(f"❌ Failed to generate test for {java_file.name}")
-                failed_files.add(java_file.name)
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    batch_results = future.result()
+                except Exception as e:
+                    print(f"Error generating improved tests for {', '.join(jf.name for jf, _ in batch)}: {e}")
+                    batch_results = {}
+                
+                for java_file, test_file in batch:
+                    after = file_state(java_file, test_file)
+                    if after is not None:
+                        state[java_file] = after
+                    prev = before.get(java_file)
+                    # Only a successful call that wrote back the very same bytes counts as
+                    # stalled; a failed one (API error, rate limit) is retried next time
+                    if (batch_results.get(java_file) and after is not None and prev is not None
+                            and (after[0], after[2]) == (prev[0], prev[2])):
+                        stalled.add(java_file)
+                    else:
+                        stalled.discard(java_file)
+                    # Generate improved test with error feedback
+                    if batch_results.get(java_file):
+                        print(f"✅ Generated improved test for {java_file.name}")
+                        improved_any = True
+                        tests_changed = True
+                        # Remove from persistent failures if it was there
+                        persistent_failures.discard(java_file.name)
+                    else:
+                        print(f"❌ Failed to generate test for {java_file.name}")
+                        failed_files.add(java_file.name)
         
         # Track persistent failures
         if not improved_any:
@@ -420,34 +767,37 @@ def main() -> int:
         print("💡 These tests will be skipped for now - user can fix them manually later")
         
         # Remove persistent failure test files to allow coverage calculation
-        for java_file in all_java_files:
+        for java_file, test_file in pairs:
             if java_file.name in persistent_failures:
-                test_file = derive_test_path_from_source(java_file)
                 if test_file.exists():
                     print(f"🗑️ Removing persistent failure test: {test_file.name}")
                     test_file.unlink()
         
         print("🔄 Running tests without persistent failures...")
-        success, output, error_messages = run_maven_tests()
+        success, output, error_messages = run_maven_tests(modules)
+        last_success, tests_changed = success, False
         
         if success:
             print("✅ Tests passing after removing persistent failures!")
         else:
             print("⚠️ Some tests still failing, but continuing with coverage calculation")
     
-    # Final status
-    success, _, _ = run_maven_tests()
-    coverage = read_line_coverage()
+    # Final status; only pay for another Maven run if tests changed since the last one
+    if last_success is None or tests_changed:
+        success, _, _ = run_maven_tests(modules)
+    else:
+        success = last_success
+    coverage_bp = read_line_coverage_bp()
     
     # Adjust threshold if we have persistent failures
-    effective_threshold = threshold
+    effective_threshold_bp = threshold_bp
     if persistent_failures:
-        effective_threshold = max(50.0, threshold * 0.7)  # Lower threshold for persistent failures
-        print(f"📊 Adjusted coverage threshold to {effective_threshold}% due to persistent failures")
+        effective_threshold_bp = max(5000, threshold_bp * 7 // 10)  # Lower threshold for persistent failures
+        print(f"📊 Adjusted coverage threshold to {effective_threshold_bp / 100:.2f}% due to persistent failures")
     
     print(f"\n📊 Final Results:")
     print(f"  Tests passing: {'✅' if success else '❌'}")
-    print(f"  Coverage: {coverage}% (target: {effective_threshold}%)")
+    print(f"  Coverage: {coverage_bp / 100:.2f}% (target: {effective_threshold_bp / 100:.2f}%)")
     
     if persistent_failures:
         print(f"  Persistent failures: {', '.join(persistent_failures)}")
@@ -461,8 +811,8 @@ def main() -> int:
             print("🎯 Recommendation: Push the working tests and fix persistent failures manually")
             return 0  # Allow the workflow to continue with working tests
         return 1
-    elif coverage < effective_threshold:
-        print(f"⚠️ Coverage {coverage}% below threshold {effective_threshold}%")
+    elif coverage_bp < effective_threshold_bp:
+        print(f"⚠️ Coverage {coverage_bp / 100:.2f}% below threshold {effective_threshold_bp / 100:.2f}%")
         return 1
     else:
         print("🎉 All tests passing and coverage target met!")
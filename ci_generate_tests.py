@@ -3,8 +3,19 @@
 import os
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import List, Optional, Tuple
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None  # Optional; the git CLI is used instead
+
+try:
+    from generate_tests import generate
+except ImportError:
+    generate = None  # Fall back to running generate_tests.py as a script
 
 REPO_ROOT = Path(__file__).parent
 SOURCE_PATH = os.environ.get("SOURCE_PATH", "src/main/java")
@@ -13,6 +24,9 @@ APP_SRC = REPO_ROOT / SOURCE_PATH
 AGENT_TEST_SRC = REPO_ROOT / TEST_PATH
 GUIDE_PATH = REPO_ROOT / "PROMPT_GUIDE.md"
 GEN_SCRIPT = REPO_ROOT / "generate_tests.py"
+GEN_PARALLEL = max(1, int(os.environ.get("GEN_PARALLEL", "4")))
+# Set GEN_NO_CACHE to always call the model instead of reusing cached responses
+GEN_USE_CACHE = not os.environ.get("GEN_NO_CACHE")
 
 
 def run(cmd: List[str], cwd: Path = REPO_ROOT, check: bool = True) -> Tuple[int, str]:
@@ -22,34 +36,90 @@ def run(cmd: List[str], cwd: Path = REPO_ROOT, check: bool = True) -> Tuple[int,
     return proc.returncode, proc.stdout
 
 
+def _pygit2_changed_java_files(base_sha: str, head_sha: str) -> Optional[List[Path]]:
+    """Diff two commits in-process with libgit2; None means fall back to the git CLI"""
+    if pygit2 is None:
+        return None
+    try:
+        repo = pygit2.Repository(pygit2.discover_repository(str(REPO_ROOT)))
+        base = repo.revparse_single(base_sha).peel(pygit2.Commit)
+        head = repo.revparse_single(head_sha).peel(pygit2.Commit)
+        # Plain tree-to-tree diff: no rename detection and no binary sniffing
+        diff = base.tree.diff_to_tree(head.tree, flags=pygit2.GIT_DIFF_SKIP_BINARY_CHECK)
+        workdir = Path(repo.workdir).resolve()
+        prefix = APP_SRC.resolve().relative_to(workdir).as_posix() + "/"
+    except Exception as e:
+        print(f"⚠️ pygit2 diff unavailable ({e}); falling back to git CLI")
+        return None
+    files = []
+    for delta in diff.deltas:
+        path = delta.new_file.path
+        # Deleted sources have nothing left to test
+        if delta.status == pygit2.GIT_DELTA_DELETED or not path.endswith(".java") or not path.startswith(prefix):
+            continue
+        files.append(workdir / path)
+    return files
+
+
+def _rev_exists(rev: str) -> bool:
+    """Check that rev names a local commit without walking any history"""
+    return subprocess.call(
+        ["git", "rev-parse", "--verify", "--quiet", f"{rev}^{{commit}}"],
+        cwd=str(REPO_ROOT), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    ) == 0
+
+
+def _git_diff_names(*revs: str) -> List[str]:
+    """List added/modified/renamed paths between revs; NUL-separated so any file name survives"""
+    cmd = ["git", "diff", "--name-only", "-z", "--diff-filter=AMR", *revs]
+    proc = subprocess.run(cmd, cwd=str(REPO_ROOT), stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Command failed ({proc.returncode}): {' '.join(cmd)}\n{os.fsdecode(proc.stdout)}")
+    return [os.fsdecode(f) for f in proc.stdout.split(b"\0") if f]
+
+
 def get_changed_java_files(base_sha: str, head_sha: str) -> List[Path]:
     """Get only changed Java files - NO FALLBACK to all files"""
     print(f"🔍 Attempting git diff: {base_sha}..{head_sha}")
     
-    # Try different git diff approaches to handle various scenarios
-    try:
-        # First try the standard range approach
-        _code, out = run(["git", "diff", "--name-only", f"{base_sha}..{head_sha}"])
-        print(f"✅ Git diff successful: {base_sha}..{head_sha}")
-    except RuntimeError as e:
-        print(f"❌ Git diff failed: {base_sha}..{head_sha} - {e}")
-        try:
+    # Fast path: a single in-process libgit2 tree diff
+    java_files = _pygit2_changed_java_files(base_sha, head_sha)
+    if java_files is not None:
+        print(f"✅ pygit2 diff successful: {base_sha}..{head_sha}")
+    else:
+        # Try different git diff approaches to handle various scenarios,
+        # checking cheaply that both revs exist before paying for a diff
+        files = None
+        if _rev_exists(base_sha) and _rev_exists(head_sha):
+            try:
+                # First try the standard range approach
+                files = _git_diff_names(f"{base_sha}..{head_sha}")
+                print(f"✅ Git diff successful: {base_sha}..{head_sha}")
+            except RuntimeError as e:
+                print(f"❌ Git diff failed: {base_sha}..{head_sha} - {e}")
+        else:
+            print(f"❌ Git revs not available locally: {base_sha}..{head_sha}")
+        if files is None:
             # If range fails, try comparing with HEAD~1 (should work with fetch-depth: 0)
-            _code, out = run(["git", "diff", "--name-only", "HEAD~1", "HEAD"])
-            print("✅ Git diff successful: HEAD~1..HEAD")
-        except RuntimeError as e:
-            print(f"❌ Git diff failed: HEAD~1..HEAD - {e}")
+            if _rev_exists("HEAD~1"):
+                try:
+                    files = _git_diff_names("HEAD~1", "HEAD")
+                    print("✅ Git diff successful: HEAD~1..HEAD")
+                except RuntimeError as e:
+                    print(f"❌ Git diff failed: HEAD~1..HEAD - {e}")
+            else:
+                print("❌ HEAD~1 not available locally")
+        if files is None:
             print("🚫 CRITICAL: Cannot determine changed files - ABORTING to prevent processing all files")
             print("💡 This prevents the AI from being overwhelmed with too much context")
             return []
-    
-    # If we get here, we have output from git diff
-    files = [line.strip() for line in out.splitlines() if line.strip()]
-    java_files = []
-    for f in files:
-        p = (REPO_ROOT / f).resolve()
-        if p.suffix == ".java" and str(p).startswith(str(APP_SRC)):
-            java_files.append(p)
+        
+        # If we get here, we have output from git diff
+        java_files = []
+        for f in files:
+            p = (REPO_ROOT / f).resolve()
+            if p.suffix == ".java" and str(p).startswith(str(APP_SRC)):
+                java_files.append(p)
     
     # LIMIT TO ONLY CHANGED FILES - Don't process entire repository
     if not java_files:
@@ -73,6 +143,38 @@ def ensure_parent_dir(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
+def generate_one(jf: Path) -> Tuple[int, str]:
+    """Generate a test for one source file; never raises, so one failure cannot abort the pool"""
+    try:
+        return _generate_one(jf)
+    except Exception as e:
+        return 1, f"Error generating test for {jf}: {e}\n"
+
+
+def _generate_one(jf: Path) -> Tuple[int, str]:
+    """Generate a test for one source file, in-process unless GEN_SUBPROCESS is set"""
+    out_path = derive_test_path(jf)
+    ensure_parent_dir(out_path)
+    print(f"Generating test for {jf} -> {out_path}")
+    model = os.environ.get("GEN_MODEL", "gemini-1.5-pro")
+    if generate is not None and not os.environ.get("GEN_SUBPROCESS"):
+        return generate(str(jf), str(out_path), model, str(GUIDE_PATH), use_cache=GEN_USE_CACHE)
+    cache_flag = [] if GEN_USE_CACHE else ["--no-cache"]
+    return run([
+        sys.executable,
+        str(GEN_SCRIPT),
+        "--guide",
+        str(GUIDE_PATH),
+        "--model",
+        model,
+        "--java",
+        str(jf),
+        "--out",
+        str(out_path),
+        *cache_flag,
+    ], check=False)
+
+
 def main() -> int:
     print("🔍 Starting ci_generate_tests.py...")
     
@@ -100,23 +202,13 @@ def main() -> int:
         return 0
 
     failures = []
-    for jf in changed:
-        out_path = derive_test_path(jf)
-        ensure_parent_dir(out_path)
-        print(f"Generating test for {jf} -> {out_path}")
-        code, out = run([
-            sys.executable,
-            str(GEN_SCRIPT),
-            "--guide",
-            str(GUIDE_PATH),
-            "--model",
-            os.environ.get("GEN_MODEL", "gemini-1.5-pro"),
-            "--java",
-            str(jf),
-            "--out",
-            str(out_path),
-        ], check=False)
+    # Each generation mostly waits on the model API, so threads are enough
+    # to overlap them; results come back in input order
+    with ThreadPoolExecutor(max_workers=GEN_PARALLEL) as executor:
+        results = list(executor.map(generate_one, changed))
+    for jf, (code, out) in zip(changed, results):
         if code != 0:
+            out_path = derive_test_path(jf)
             failures.append((jf, out))
             # If generation fails, create a minimal compilable skeleton to keep CI green but visible
             skeleton = (
@@ -1,17 +1,24 @@
 #!/usr/bin/env python3
 
+import functools
 import os
 import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 import xml.etree.ElementTree as ET
 
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None  # Optional; the git CLI is used instead
+
 REPO_ROOT = Path(__file__).parent
 SOURCE_PATH = os.environ.get("SOURCE_PATH", "src/main/java")
 TEST_PATH = os.environ.get("TEST_PATH", "src/test/java")
 AGENT_TEST_SRC = REPO_ROOT / TEST_PATH
+SRC_DIR = (REPO_ROOT / SOURCE_PATH).absolute()
 GUIDE_PATH = REPO_ROOT / "PROMPT_GUIDE.md"
 GEN_SCRIPT = REPO_ROOT / "generate_tests.py"
 
@@ -23,6 +30,27 @@ def run(cmd: List[str], cwd: Path = REPO_ROOT, check: bool = True) -> Tuple[int,
     return proc.returncode, proc.stdout
 
 
+# Directories that never contain Maven reports; pruned from the fallback walk
+_JACOCO_SKIP_DIRS = {'.git', 'node_modules', '.idea', '.mvn', 'src'}
+
+
+def _find_jacoco(root: Path) -> List[Path]:
+    """Find the first target/site/jacoco*/jacoco.xml under root without descending into sources or build output"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        tail = Path(dirpath).parts[-3:]
+        if tail[-1] == 'target':
+            dirnames[:] = [d for d in dirnames if d == 'site']
+        elif tail[-2:] == ('target', 'site'):
+            dirnames[:] = [d for d in dirnames if d.startswith('jacoco')]
+        elif len(tail) == 3 and tail[:2] == ('target', 'site'):
+            if 'jacoco.xml' in filenames:
+                return [Path(dirpath) / 'jacoco.xml']
+            dirnames[:] = []
+        else:
+            dirnames[:] = [d for d in dirnames if d not in _JACOCO_SKIP_DIRS and not d.startswith('.')]
+    return []
+
+
 def jacoco_xml_paths() -> List[Path]:
     # Look for test module reports first (they have the actual coverage data)
     test_modules = ["agent-tests", "copilot-tests"]  # agent-tests first as it has the actual coverage data
@@ -38,7 +66,7 @@ def jacoco_xml_paths() -> List[Path]:
             return [module_path]
     
     # Last resort: any jacoco.xml
-    return list(REPO_ROOT.glob("**/target/site/jacoco*/jacoco.xml"))
+    return _find_jacoco(REPO_ROOT)
 
 
 def read_line_coverage() -> float:
@@ -46,23 +74,19 @@ def read_line_coverage() -> float:
     if not paths:
         return 0.0
     try:
-        tree = ET.parse(paths[0])
-        root = tree.getroot()
-        
-        # Look for the root-level LINE counter (the overall coverage)
-        # It should be the last one in the document
-        line_counters = []
-        for counter in root.iter("counter"):
-            if counter.attrib.get("type") == "LINE":
-                line_counters.append(counter)
+        # Stream the report instead of building the whole tree; the root-level
+        # LINE counter (the overall coverage) is the last one in the document
+        last_line = None
+        for _event, elem in ET.iterparse(str(paths[0]), events=("end",)):
+            if elem.tag == "counter" and elem.get("type") == "LINE":
+                last_line = (elem.get("missed", "0"), elem.get("covered", "0"))
+            elem.clear()
         
-        if not line_counters:
+        if last_line is None:
             return 0.0
             
-        # Use the last (root-level) LINE counter
-        counter = line_counters[-1]
-        missed = int(counter.attrib.get("missed", "0"))
-        covered = int(counter.attrib.get("covered", "0"))
+        missed = int(last_line[0])
+        covered = int(last_line[1])
         total = missed + covered
         if total == 0:
             return 0.0
@@ -72,9 +96,94 @@ def read_line_coverage() -> float:
         return 0.0
 
 
+@functools.lru_cache(maxsize=None)
+def git_repo():
+    """Open the repository once per process; None when pygit2 is missing or no repo is found"""
+    if pygit2 is None:
+        return None
+    try:
+        return pygit2.Repository(pygit2.discover_repository(str(REPO_ROOT)))
+    except Exception as e:
+        print(f"⚠️ pygit2 could not open the repository ({e}); using git CLI")
+        return None
+
+
+def _pygit2_changed_java_files(base_sha: str, head_sha: str) -> Optional[List[Path]]:
+    """Diff two commits in-process with libgit2; None means fall back to the git CLI"""
+    repo = git_repo()
+    if repo is None:
+        return None
+    try:
+        base = repo.revparse_single(base_sha).peel(pygit2.Commit)
+        head = repo.revparse_single(head_sha).peel(pygit2.Commit)
+        # Plain tree-to-tree diff: no rename detection and no binary sniffing
+        diff = base.tree.diff_to_tree(head.tree, flags=pygit2.GIT_DIFF_SKIP_BINARY_CHECK)
+        workdir = Path(repo.workdir).resolve()
+        prefix = (REPO_ROOT / SOURCE_PATH).resolve().relative_to(workdir).as_posix() + "/"
+    except Exception as e:
+        print(f"⚠️ pygit2 diff unavailable ({e}); falling back to git CLI")
+        return None
+    files = []
+    for delta in diff.deltas:
+        path = delta.new_file.path
+        # Deleted sources have nothing left to test
+        if delta.status == pygit2.GIT_DELTA_DELETED or not path.endswith(".java") or not path.startswith(prefix):
+            continue
+        files.append(workdir / path)
+    return files
+
+
+def missed_lines_by_source() -> Dict[str, int]:
+    """Map each source in the JaCoCo report ("com/x/Foo.java") to its number of missed lines"""
+    paths = jacoco_xml_paths()
+    if not paths:
+        return {}
+    missed = {}
+    package = ""
+    try:
+        for event, elem in ET.iterparse(str(paths[0]), events=("start", "end")):
+            if event == "start":
+                if elem.tag == "package":
+                    package = elem.get("name", "")
+                continue
+            if elem.tag == "sourcefile":
+                # Source-level counters already include nested and inner classes
+                for counter in elem.iterfind("counter"):
+                    if counter.get("type") == "LINE":
+                        name = elem.get("name", "")
+                        missed[f"{package}/{name}" if package else name] = int(counter.get("missed", "0"))
+                elem.clear()
+            elif elem.tag in ("class", "package"):
+                elem.clear()
+    except Exception as e:
+        print(f"Error reading per-file coverage: {e}")
+        return {}
+    return missed
+
+
+def rank_by_missed_lines(java_files: List[Path]) -> List[Path]:
+    """Order sources by most missed lines first, dropping fully covered ones; unknown files go last"""
+    missed = missed_lines_by_source()
+    if not missed:
+        return java_files
+    ranked = []
+    for src in java_files:
+        lines = missed.get(source_rel_path(src).as_posix(), -1)
+        if lines != 0:
+            ranked.append((lines, src))
+    ranked.sort(key=lambda item: -item[0])
+    return [src for _, src in ranked]
+
+
 def get_changed_java_files(base_sha: str, head_sha: str) -> List[Path]:
-    code, out = run(["git", "diff", "--name-only", f"{base_sha}..{head_sha}"], check=False)
-    files = [f.strip() for f in out.splitlines() if f.strip().endswith(".java")]
+    files = _pygit2_changed_java_files(base_sha, head_sha)
+    if files is not None:
+        return files
+    proc = subprocess.run(
+        ["git", "diff", "--name-only", "-z", "--diff-filter=AMR", f"{base_sha}..{head_sha}"],
+        cwd=str(REPO_ROOT), stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+    files = [os.fsdecode(f) for f in proc.stdout.split(b"\0") if f.endswith(b".java")]
     # Only source files under configured source path
     keep = []
     for f in files:
@@ -84,19 +193,43 @@ def get_changed_java_files(base_sha: str, head_sha: str) -> List[Path]:
     return keep
 
 
+def _walk_java(root: str):
+    """Yield paths of *.java files under root using only directory entries, no stat calls"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(".java"):
+                        yield entry.path
+        except OSError:
+            continue
+
+
 def get_all_java_files() -> List[Path]:
     """Get all Java source files in the configured source path."""
     source_dir = REPO_ROOT / SOURCE_PATH
     if not source_dir.exists():
         return []
-    return list(source_dir.glob("**/*.java"))
+    return [Path(p) for p in _walk_java(str(source_dir))]
+
+
+def source_rel_path(java_source: Path) -> Path:
+    """Path of a source relative to the source root, i.e. its package path plus file name"""
+    try:
+        return java_source.absolute().relative_to(SRC_DIR)
+    except ValueError:
+        # Not under SOURCE_PATH (e.g. through a symlink): mirror everything after "java"
+        return Path(*java_source.parts[java_source.parts.index("java") + 1 :])
 
 
 def derive_test_path_from_source(java_source: Path) -> Path:
     # Mirror package path; name as ClassNameTest.java
-    rel = java_source.parts[java_source.parts.index("java") + 1 :]
-    class_name = java_source.stem + "Test"
-    return AGENT_TEST_SRC.joinpath(*rel[:-1], class_name + ".java")
+    rel = source_rel_path(java_source)
+    return AGENT_TEST_SRC / rel.parent / (rel.stem + "Test.java")
 
 
 def generate_test_for(java_file: Path, out_path: Path) -> bool:
@@ -148,6 +281,8 @@ def main() -> int:
     if not all_java_files:
         print("No Java sources found; skipping coverage iteration.")
         return 0
+    # Start with the classes that leave the most lines uncovered
+    all_java_files = rank_by_missed_lines(all_java_files)
 
     attempts = 0
     max_attempts = int(os.environ.get("MAX_COVERAGE_ATTEMPTS", "6"))
@@ -166,8 +301,8 @@ def main() -> int:
                 test_path.unlink(missing_ok=True)
             except Exception:
                 pass
-            # Re-run to restore prior state
-            run_project_tests()
+            # Nothing else changed on disk and coverage is only read after a
+            # passing run, so there is no need to rebuild the prior state
             continue
         attempts += 1
         cov = read_line_coverage()
@@ -1,176 +1,734 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
 import re
+import sys
 import ast
+import functools
+import hashlib
+import io
+import json
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Set, Optional
+from typing import List, Dict, Set, Optional, Tuple
 import subprocess
 
+try:
+    import tree_sitter
+    import tree_sitter_java
+except ImportError:
+    tree_sitter = None  # Optional; members are then extracted with the regexes below
+
+# Parsed contexts keyed by content hash, so unchanged files are never re-parsed
+# across runs. Bump CACHE_VERSION whenever the extracted fields change. Kept as
+# plain JSON in the user cache dir: never inside a checkout, where a PR could plant entries
+CACHE_ROOT = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ai-test-generator"
+CACHE_DIR = Path(os.environ.get("CONTEXT_CACHE_DIR") or CACHE_ROOT / "context")
+CACHE_VERSION = 8
+# Oldest entries beyond this many are evicted, along with any left by older CACHE_VERSIONs
+CACHE_MAX_ENTRIES = max(1, int(os.environ.get("CONTEXT_CACHE_MAX_ENTRIES", "5000")))
+# The directory is pruned at most once per process, on the first write
+_cache_pruned = False
+# In-process memo keyed by (path, mtime_ns, size): analyzers are created per
+# call, and an unchanged file should not be re-read or re-hashed each time
+_STAT_MEMO = {}
+
+# Patterns run on the raw file bytes; only the captured groups are ever decoded.
+# One alternation for every declaration-level token; finditer dispatches on lastgroup
+_DECLARATION_RE = re.compile(
+    rb'(?P<package>package\s+(?P<package_name>[\w.]+);)'
+    rb'|(?P<import>import\s+(?P<import_name>[\w.*]+);)'
+    rb'|(?P<class>(?:class|interface|enum)\s+(?P<class_name>\w+))'
+    rb'|(?P<extends>extends\s+(?P<extends_name>[\w.]+))'
+    rb'|(?P<implements>implements\s+(?P<implements_list>[^{]+))'
+    rb'|(?P<annotation>@(?P<annotation_name>\w+(?:\.\w+)*))'
+)
+# Standalone lookups used outside the full scan (e.g. for sibling model files)
+_PACKAGE_RE = re.compile(rb'package\s+([\w.]+);')
+_CLASS_RE = re.compile(rb'(?:public\s+)?(?:class|interface|enum)\s+(\w+)')
+_AUTOWIRED_RE = re.compile(rb'@Autowired\s+(?:public\s+)?(?:static\s+)?(?:final\s+)?(\w+(?:<[^>]+>)?)\s+(\w+)')
+# Byte sets for the hand-written member scanner
+_IDENT_BYTES = frozenset(b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_$.')
+_MODIFIERS = frozenset({
+    b'public', b'private', b'protected', b'static', b'final', b'abstract', b'synchronized',
+    b'native', b'transient', b'volatile', b'strictfp', b'default', b'sealed', b'non-sealed',
+})
+# Words that can sit where a member name or type would, inside code rather than a declaration
+_NOT_DECLARATIONS = frozenset({
+    b'if', b'for', b'while', b'switch', b'catch', b'synchronized', b'try', b'return', b'new',
+    b'else', b'do', b'throw', b'case', b'assert', b'yield', b'finally',
+})
+_TYPE_KEYWORDS = frozenset({b'class', b'interface', b'enum', b'record', b'@interface'})
+# Comments (an unterminated block comment runs to the end, e.g. in a truncated
+# head read) and string/char literals; a leftmost match means "//" inside a
+# string and quotes inside a comment are handled correctly
+_COMMENT_OR_LITERAL_RE = re.compile(rb'//[^\n]*|/\*.*?(?:\*/|\Z)|("(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')', re.S)
+SPRING_ANNOTATIONS = [
+    'Service', 'Repository', 'Controller', 'RestController',
+    'Component', 'Configuration', 'Entity', 'Table'
+]
+
+# Parsers are not thread-safe, so each thread builds its own on first use
+_TS_LOCAL = threading.local()
+
+
+def _java_parser():
+    """A tree-sitter Java parser for this thread, or None when tree-sitter is unavailable"""
+    if tree_sitter is None:
+        return None
+    parser = getattr(_TS_LOCAL, 'parser', False)
+    if parser is False:
+        try:
+            language = tree_sitter.Language(tree_sitter_java.language())
+            try:
+                parser = tree_sitter.Parser(language)
+            except TypeError:
+                # tree-sitter < 0.22
+                parser = tree_sitter.Parser()
+                parser.set_language(language)
+        except Exception as e:
+            print(f"⚠️ tree-sitter Java grammar unavailable ({e}); using regex extraction")
+            parser = None
+        _TS_LOCAL.parser = parser
+    return parser
+
+
+# Recorded in the cache key: both extractors produce the same shape but not the same entries
+_PARSER_TAG = "ts" if _java_parser() is not None else "re"
+
+
+def _text(raw: bytes) -> str:
+    return raw.decode('utf-8', 'replace')
+
+
+def _as_bytes(content) -> bytes:
+    return content.encode('utf-8') if isinstance(content, str) else content
+
+
+def _blank(match) -> bytes:
+    # Literals keep their (now empty) quotes so the statement still has a value.
+    # Comments shrink to one space rather than one per byte: the extractor
+    # patterns chain several \s* and backtrack badly over long whitespace runs
+    return match.group()[:1] * 2 if match.group(1) else b' '
+
+
+def _strip_comments_and_literals(content: bytes) -> bytes:
+    """Blank out comments and string/char literals so the regexes cannot match inside them"""
+    return _COMMENT_OR_LITERAL_RE.sub(_blank, content)
+
+
+def _unique_rows(*columns: List) -> Tuple[List, ...]:
+    """Drop repeated rows across parallel columns, keeping the first of each in source order"""
+    seen = set()
+    keep = []
+    for i, row in enumerate(zip(*columns)):
+        key = tuple(tuple(value) if isinstance(value, list) else value for value in row)
+        if key not in seen:
+            seen.add(key)
+            keep.append(i)
+    if len(keep) == len(columns[0]):
+        return columns
+    return tuple([column[i] for i in keep] for column in columns)
+
+
+def _format_params(types: List[str], names: List[str]) -> str:
+    return ', '.join(f"{ptype} {pname}" for ptype, pname in zip(types, names))
+
+
+def _node_text(content: bytes, node) -> str:
+    # Collapse line breaks inside multi-line generic types
+    return ' '.join(_text(content[node.start_byte:node.end_byte]).split())
+
+
+def _ts_parameters(content: bytes, node) -> Tuple[List[str], List[str]]:
+    types, names = [], []
+    if node is None:
+        return types, names
+    for param in node.named_children:
+        if param.type == 'formal_parameter':
+            ptype, pname = param.child_by_field_name('type'), param.child_by_field_name('name')
+        elif param.type == 'spread_parameter':
+            # Varargs: the type is a direct child and the name sits in a variable_declarator
+            ptype = next((c for c in param.named_children if c.type not in ('modifiers', 'variable_declarator')), None)
+            decl = next((c for c in param.named_children if c.type == 'variable_declarator'), None)
+            pname = decl.child_by_field_name('name') if decl is not None else None
+        else:
+            continue
+        if ptype is not None and pname is not None:
+            types.append(_node_text(content, ptype) + ('...' if param.type == 'spread_parameter' else ''))
+            names.append(_node_text(content, pname))
+    return types, names
+
+
+def _ts_members(content: bytes) -> Optional[Dict]:
+    """Fields, constructors and methods from the syntax tree; None when tree-sitter is unavailable"""
+    parser = _java_parser()
+    if parser is None:
+        return None
+    fields = ([], [])
+    constructors = ([], [], [])
+    methods = ([], [], [], [])
+    stack = [parser.parse(content).root_node]
+    while stack:
+        node = stack.pop()
+        kind = node.type
+        if kind == 'field_declaration':
+            ftype = node.child_by_field_name('type')
+            for decl in node.children_by_field_name('declarator'):
+                name = decl.child_by_field_name('name')
+                if ftype is not None and name is not None:
+                    fields[0].append(_node_text(content, ftype))
+                    fields[1].append(_node_text(content, name))
+        elif kind == 'constructor_declaration':
+            ptypes, pnames = _ts_parameters(content, node.child_by_field_name('parameters'))
+            constructors[0].append(_node_text(content, node.child_by_field_name('name')))
+            constructors[1].append(ptypes)
+            constructors[2].append(pnames)
+        elif kind == 'method_declaration':
+            ptypes, pnames = _ts_parameters(content, node.child_by_field_name('parameters'))
+            methods[0].append(_node_text(content, node.child_by_field_name('type')))
+            methods[1].append(_node_text(content, node.child_by_field_name('name')))
+            methods[2].append(ptypes)
+            methods[3].append(pnames)
+        # Reversed so members come out in source order, nested classes included
+        stack.extend(reversed(node.named_children))
+    return {'fields': fields, 'constructors': constructors, 'methods': methods}
+
+
+@functools.lru_cache(maxsize=32)
+def _scan_declarations(content: bytes) -> Dict:
+    """Collect package, imports, class header and annotations in a single regex pass, once per distinct content"""
+    found = {
+        'package': "", 'imports': [], 'class_name': "", 'extends': "",
+        'implements': [], 'annotations': [], 'dependencies': [],
+    }
+    for match in _DECLARATION_RE.finditer(content):
+        kind = match.lastgroup
+        if kind == 'import':
+            found['imports'].append(_text(match.group('import_name')))
+        elif kind == 'annotation':
+            name = _text(match.group('annotation_name'))
+            found['annotations'].append(name)
+            if name == 'Autowired':
+                dep = _AUTOWIRED_RE.match(content, match.start())
+                if dep:
+                    found['dependencies'].append({
+                        'type': _text(dep.group(1)),
+                        'name': _text(dep.group(2)),
+                        'annotation': 'Autowired'
+                    })
+        elif kind == 'package':
+            found['package'] = found['package'] or _text(match.group('package_name'))
+        elif kind == 'class':
+            found['class_name'] = found['class_name'] or _text(match.group('class_name'))
+        elif kind == 'extends':
+            found['extends'] = found['extends'] or _text(match.group('extends_name'))
+        elif kind == 'implements' and not found['implements']:
+            found['implements'] = [imp.strip() for imp in _text(match.group('implements_list')).split(',')]
+    # The same annotation on many members (or a repeated import) only costs prompt tokens
+    found['imports'] = list(dict.fromkeys(found['imports']))
+    found['annotations'] = list(dict.fromkeys(found['annotations']))
+    # Whole annotation names only, so e.g. @ServiceScope is not taken for @Service
+    names = set(found['annotations'])
+    found['spring_annotations'] = [spring for spring in SPRING_ANNOTATIONS if spring in names]
+    return found
+
+
+def _is_identifier(token: bytes) -> bool:
+    return bool(token) and not token[:1].isdigit() and all(c in _IDENT_BYTES and c != 46 for c in token)
+
+
+def _ident_start(data: bytes, end: int) -> int:
+    """Index where the (possibly dotted) identifier ending at end starts"""
+    start = end
+    while start > 0 and data[start - 1] in _IDENT_BYTES:
+        start -= 1
+    return start
+
+
+def _matching_open(data: bytes, close: int, opener: int, closer: int) -> int:
+    """Index of the bracket opening the one at close, or -1"""
+    depth = 0
+    for i in range(close, -1, -1):
+        c = data[i]
+        if c == closer:
+            depth += 1
+        elif c == opener:
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+
+def _top_level_split(data: bytes) -> List[bytes]:
+    """Split on commas outside any (), <>, [] or {} nesting"""
+    parts = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(data):
+        if c in b'(<[{':
+            depth += 1
+        elif c in b')>]}':
+            depth = max(depth - 1, 0)
+        elif c == 44 and depth == 0:  # ','
+            parts.append(data[start:i])
+            start = i + 1
+    parts.append(data[start:])
+    return parts
+
+
+def _skip_annotations(data: bytes) -> bytes:
+    """Drop leading annotations, including any (arguments)"""
+    data = data.lstrip()
+    while data.startswith(b'@') and not data.startswith(b'@interface'):
+        end = 1
+        while end < len(data) and data[end] in _IDENT_BYTES:
+            end += 1
+        data = data[end:].lstrip()
+        if data.startswith(b'('):
+            depth = 0
+            for i, c in enumerate(data):
+                if c == 40:
+                    depth += 1
+                elif c == 41:
+                    depth -= 1
+                    if depth == 0:
+                        data = data[i + 1:].lstrip()
+                        break
+            else:
+                return b''
+    return data
+
+
+def _split_params(param_list: str) -> Tuple[List[str], List[str]]:
+    types, names = [], []
+    for param in _top_level_split(param_list.encode('utf-8')):
+        parts = [p for p in _skip_annotations(param).split() if p != b'final']
+        if len(parts) >= 2:
+            types.append(_text(b' '.join(parts[:-1])))
+            names.append(_text(parts[-1]))
+    return types, names
+
+
+def _parse_signature(sig: bytes) -> Optional[Tuple[bytes, bytes, bytes]]:
+    """Split "... Type name(params) [throws X]" into (type, name, params); type is b'' for a constructor"""
+    close = sig.rfind(b')')
+    if close == -1:
+        return None
+    tail = sig[close + 1:].strip()
+    if tail and not tail.startswith(b'throws'):
+        return None
+    open_ = _matching_open(sig, close, 40, 41)
+    if open_ == -1:
+        return None
+    head = sig[:open_].rstrip()
+    name_start = _ident_start(head, len(head))
+    name = head[name_start:]
+    if not _is_identifier(name) or name in _NOT_DECLARATIONS:
+        return None
+    rest = head[:name_start].rstrip()
+    # Walk back over array brackets and type arguments to the type's name
+    end = len(rest)
+    while rest.endswith(b'[]', 0, end):
+        end = len(rest[:end - 2].rstrip())
+    if end and rest[end - 1] == 62:  # '>'
+        end = _matching_open(rest, end - 1, 60, 62)
+        if end == -1:
+            return None
+    type_start = _ident_start(rest, end)
+    rtype = rest[type_start:]
+    if type_start == end:
+        # No type before the name: a constructor, unless something other than
+        # modifiers or type parameters precedes it
+        if end and rest[end - 1] not in b' \t\r\n>':
+            return None
+        return b'', name, sig[open_ + 1:close]
+    if rtype in _MODIFIERS:
+        return b'', name, sig[open_ + 1:close]
+    if rest[type_start:end] in _NOT_DECLARATIONS:
+        return None
+    return b' '.join(rtype.split()), name, sig[open_ + 1:close]
+
+
+@functools.lru_cache(maxsize=32)
+def _scan_members(content: bytes) -> Dict:
+    """
+    Fields, constructors and methods declared directly in type bodies, found by
+    walking the '{', ';' and '}' anchors once and parsing the declaration before
+    each by hand. Expects comments and literals to be blanked out already.
+    """
+    fields = ([], [])
+    constructors = ([], [], [])
+    methods = ([], [], [], [])
+
+    def add_callable(parsed) -> None:
+        rtype, name, params = parsed
+        ptypes, pnames = _split_params(_text(params))
+        if rtype:
+            methods[0].append(_text(rtype))
+            methods[1].append(_text(name))
+            methods[2].append(ptypes)
+            methods[3].append(pnames)
+        else:
+            constructors[0].append(_text(name))
+            constructors[1].append(ptypes)
+            constructors[2].append(pnames)
+
+    def add_fields(statement: bytes) -> None:
+        # "Type a = x, b;" declares one field per top-level comma
+        parts = _top_level_split(statement)
+        tokens = [t for t in parts[0].split(b'=', 1)[0].split() if t not in _MODIFIERS]
+        if len(tokens) < 2 or not _is_identifier(tokens[-1]) or tokens[0] in _NOT_DECLARATIONS:
+            return
+        ftype = _text(b' '.join(tokens[:-1]))
+        fields[0].append(ftype)
+        fields[1].append(_text(tokens[-1]))
+        for part in parts[1:]:
+            name = part.split(b'=', 1)[0].strip()
+            if _is_identifier(name):
+                fields[0].append(ftype)
+                fields[1].append(_text(name))
+
+    # One entry per open brace: True for a class/interface/enum body, where
+    # members are declared; False for code blocks and initializers
+    blocks = []
+    start = 0
+    next_open = content.find(b'{')
+    next_semi = content.find(b';')
+    next_close = content.find(b'}')
+    while True:
+        pos = min((i for i in (next_open, next_semi, next_close) if i != -1), default=-1)
+        if pos == -1:
+            break
+        in_type = bool(blocks) and blocks[-1]
+        if pos == next_close:
+            if blocks:
+                blocks.pop()
+            next_close = content.find(b'}', pos + 1)
+        elif pos == next_open:
+            segment = _skip_annotations(content[start:pos])
+            if any(token in _TYPE_KEYWORDS for token in segment.split()):
+                blocks.append(True)
+            else:
+                if in_type:
+                    parsed = _parse_signature(segment)
+                    if parsed is not None:
+                        add_callable(parsed)
+                    elif b'=' in segment:
+                        # A field whose initializer opens a block (array, lambda, anonymous class)
+                        add_fields(segment)
+                blocks.append(False)
+            next_open = content.find(b'{', pos + 1)
+        else:
+            if in_type:
+                segment = _skip_annotations(content[start:pos])
+                eq = segment.find(b'=')
+                paren = segment.find(b'(')
+                if paren != -1 and (eq == -1 or paren < eq):
+                    # Abstract or interface method
+                    parsed = _parse_signature(segment)
+                    if parsed is not None and parsed[0]:
+                        add_callable(parsed)
+                elif segment:
+                    add_fields(segment)
+            next_semi = content.find(b';', pos + 1)
+        start = pos + 1
+    return {'fields': fields, 'constructors': constructors, 'methods': methods}
+
+
+# Pure functions of the content; each pattern is bound as a default argument
+# so the hot lookups are fast locals rather than globals or self attributes
+def _extract_package(content, _re=_PACKAGE_RE) -> str:
+    match = _re.search(_as_bytes(content))
+    return _text(match.group(1)) if match else ""
+
+
+def _extract_class_name(content, _re=_CLASS_RE) -> str:
+    match = _re.search(_as_bytes(content))
+    return _text(match.group(1)) if match else ""
+
+
+def _extract_imports(content) -> List[str]:
+    return _scan_declarations(_as_bytes(content))['imports']
+
+
+def _extract_extends(content) -> str:
+    return _scan_declarations(_as_bytes(content))['extends']
+
+
+def _extract_implements(content) -> List[str]:
+    return _scan_declarations(_as_bytes(content))['implements']
+
+
+def _extract_annotations(content) -> List[str]:
+    return _scan_declarations(_as_bytes(content))['annotations']
+
+
+def _extract_dependencies(content) -> List[Dict]:
+    # Look for @Autowired, @Mock, @InjectMocks, etc.
+    return _scan_declarations(_as_bytes(content))['dependencies']
+
+
+def _extract_spring_annotations(content) -> List[str]:
+    return _scan_declarations(_as_bytes(content))['spring_annotations']
+
+
+def _extract_fields(content) -> Tuple[List[str], List[str]]:
+    """Field declarations as parallel (types, names)"""
+    return _scan_members(_as_bytes(content))['fields']
+
+
+def _extract_constructors(content) -> Tuple[List[str], List[List[str]], List[List[str]]]:
+    """Constructor declarations as parallel (names, parameter types, parameter names)"""
+    return _scan_members(_as_bytes(content))['constructors']
+
+
+def _extract_methods(content) -> Tuple[List[str], List[str], List[List[str]], List[List[str]]]:
+    """Method declarations as parallel (return types, names, parameter types, parameter names)"""
+    return _scan_members(_as_bytes(content))['methods']
+
+
+@functools.lru_cache(maxsize=None)
+def _model_classes_in(models_dir: str) -> tuple:
+    """Class names declared in a models directory; the directory is invariant for a run"""
+    names = []
+    try:
+        with os.scandir(models_dir) as it:
+            model_files = [entry.path for entry in it if entry.name.endswith('.java') and entry.is_file()]
+    except OSError:
+        return ()
+    for model_file in model_files:
+        with open(model_file, 'rb') as fh:
+            # The declaration almost always sits in the first couple of KB;
+            # a licence header or javadoc mentioning "class" must not count
+            head = fh.read(2048)
+            match = _CLASS_RE.search(_strip_comments_and_literals(head))
+            if match is None:
+                match = _CLASS_RE.search(_strip_comments_and_literals(head + fh.read()))
+        if match:
+            names.append(_text(match.group(1)))
+    return tuple(names)
+
+class JavaContext(dict):
+    """Analyzed file context; the 'model_classes' directory scan only runs when first read"""
+    def __init__(self, parsed: Dict, find_model_classes):
+        super().__init__(parsed)
+        self._find_model_classes = find_model_classes
+    
+    def __missing__(self, key):
+        if key != 'model_classes':
+            raise KeyError(key)
+        value = self[key] = self._find_model_classes()
+        return value
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+def _prune_context_cache(cache_dir: Path) -> None:
+    """Remove entries from older CACHE_VERSIONs, then the least recently written beyond CACHE_MAX_ENTRIES"""
+    prefix = f"v{CACHE_VERSION}-"
+    current = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.tmp'):
+                    continue  # Being written by another process
+                if not entry.name.startswith(prefix):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    current.append((entry.stat().st_mtime_ns, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return
+    if len(current) <= CACHE_MAX_ENTRIES:
+        return
+    current.sort()
+    for _, path in current[:len(current) - CACHE_MAX_ENTRIES]:
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+
 class JavaContextAnalyzer:
     def __init__(self, source_path: str):
         self.source_path = Path(source_path)
         self.context_cache = {}
+        # Raw source of every analyzed file, so it is read from disk only once
+        self.content_cache = {}
+        self.cache_dir = CACHE_DIR
     
-    def analyze_java_file(self, file_path: Path) -> Dict:
-        """Analyze a Java file and extract comprehensive context"""
-        if file_path in self.context_cache:
-            return self.context_cache[file_path]
-        
+    def _cache_key(self, data: bytes) -> str:
+        return f"v{CACHE_VERSION}-{_PARSER_TAG}-{hashlib.blake2b(data, digest_size=16).hexdigest()}"
+    
+    def _load_cached(self, key: str) -> Optional[Dict]:
+        if key in self.context_cache:
+            return self.context_cache[key]
+        # Look the entry up by path: no directory listing, however large the cache
+        try:
+            with open(self.cache_dir / (key + '.json'), 'r', encoding='utf-8') as f:
+                parsed = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(parsed, dict):
+            return None
+        self.context_cache[key] = parsed
+        return parsed
+    
+    def _store_cached(self, key: str, parsed: Dict) -> None:
+        self.context_cache[key] = parsed
         try:
-            content = file_path.read_text(encoding='utf-8')
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_dir / f"{key}.{os.getpid()}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(parsed, f, separators=(',', ':'))
+            os.replace(tmp, self.cache_dir / (key + '.json'))
+        except OSError as e:
+            print(f"Could not write context cache for {key}: {e}")
+            return
+        global _cache_pruned
+        if not _cache_pruned:
+            _cache_pruned = True
+            _prune_context_cache(self.cache_dir)
+    
+    def _load(self, file_path: Path) -> Optional[Tuple[tuple, bytes, Dict]]:
+        """Read and parse a file (or reuse the memo/disk cache); None if it cannot be read"""
+        try:
+            st = file_path.stat()
+            stat_key = (os.fspath(file_path), st.st_mtime_ns, st.st_size)
+            memo = _STAT_MEMO.get(stat_key)
+            if memo is None:
+                data = file_path.read_bytes()
         except Exception as e:
             print(f"Error reading {file_path}: {e}")
-            return {}
-        
-        context = {
-            'package': self._extract_package(content),
-            'imports': self._extract_imports(content),
-            'class_name': self._extract_class_name(content),
-            'extends': self._extract_extends(content),
-            'implements': self._extract_implements(content),
-            'annotations': self._extract_annotations(content),
-            'fields': self._extract_fields(content),
-            'constructors': self._extract_constructors(content),
-            'methods': self._extract_methods(content),
-            'dependencies': self._extract_dependencies(content),
-            'spring_annotations': self._extract_spring_annotations(content),
-            'model_classes': self._find_model_classes(content),
-        }
+            return None
         
-        self.context_cache[file_path] = context
-        return context
-    
-    def _extract_package(self, content: str) -> str:
-        match = re.search(r'package\s+([\w.]+);', content)
-        return match.group(1) if match else ""
-    
-    def _extract_imports(self, content: str) -> List[str]:
-        imports = re.findall(r'import\s+([\w.*]+);', content)
-        return imports
-    
-    def _extract_class_name(self, content: str) -> str:
-        match = re.search(r'(?:public\s+)?(?:class|interface|enum)\s+(\w+)', content)
-        return match.group(1) if match else ""
-    
-    def _extract_extends(self, content: str) -> str:
-        match = re.search(r'extends\s+([\w.]+)', content)
-        return match.group(1) if match else ""
-    
-    def _extract_implements(self, content: str) -> List[str]:
-        match = re.search(r'implements\s+([^{]+)', content)
-        if match:
-            return [imp.strip() for imp in match.group(1).split(',')]
-        return []
-    
-    def _extract_annotations(self, content: str) -> List[str]:
-        annotations = re.findall(r'@(\w+(?:\.\w+)*)', content)
-        return annotations
+        if memo is not None:
+            data, parsed = memo
+        else:
+            key = self._cache_key(data)
+            parsed = self._load_cached(key)
+            if parsed is None:
+                parsed = self._parse_content(data)
+                self._store_cached(key, parsed)
+            _STAT_MEMO[stat_key] = (data, parsed)
+        return stat_key, data, parsed
     
-    def _extract_fields(self, content: str) -> List[Dict]:
-        fields = []
-        # Match field declarations
-        field_pattern = r'(?:@\w+(?:\([^)]*\))?\s*)*\s*(?:public|private|protected)?\s*(?:static\s+)?(?:final\s+)?(\w+(?:<[^>]+>)?)\s+(\w+)(?:\s*=\s*[^;]+)?;'
-        for match in re.finditer(field_pattern, content):
-            fields.append({
-                'type': match.group(1),
-                'name': match.group(2)
-            })
-        return fields
+    def _context(self, file_path: Path, data: bytes, parsed: Dict) -> Dict:
+        self.content_cache[file_path] = data
+        # Model classes depend on sibling files, not on this file's content
+        return JavaContext(parsed, lambda: self._model_classes_for_package(parsed['package']))
     
-    def _extract_constructors(self, content: str) -> List[Dict]:
-        constructors = []
-        # Match constructor declarations
-        constructor_pattern = r'(?:public\s+)?(\w+)\s*\(([^)]*)\)\s*\{'
-        for match in re.finditer(constructor_pattern, content):
-            params = []
-            if match.group(2).strip():
-                for param in match.group(2).split(','):
-                    param = param.strip()
-                    if param:
-                        parts = param.split()
-                        if len(parts) >= 2:
-                            params.append({
-                                'type': parts[0],
-                                'name': parts[1]
-                            })
-            constructors.append({
-                'name': match.group(1),
-                'parameters': params
-            })
-        return constructors
-    
-    def _extract_methods(self, content: str) -> List[Dict]:
-        methods = []
-        # Match method declarations
-        method_pattern = r'(?:@\w+(?:\([^)]*\))?\s*)*\s*(?:public|private|protected)?\s*(?:static\s+)?(?:final\s+)?(\w+(?:<[^>]+>)?)\s+(\w+)\s*\(([^)]*)\)\s*(?:throws\s+[\w\s,]+)?\s*\{'
-        for match in re.finditer(method_pattern, content):
-            params = []
-            if match.group(3).strip():
-                for param in match.group(3).split(','):
-                    param = param.strip()
-                    if param:
-                        parts = param.split()
-                        if len(parts) >= 2:
-                            params.append({
-                                'type': parts[0],
-                                'name': parts[1]
-                            })
-            methods.append({
-                'return_type': match.group(1),
-                'name': match.group(2),
-                'parameters': params
-            })
-        return methods
+    def analyze_java_file(self, file_path: Path) -> Dict:
+        """Analyze a Java file and extract comprehensive context"""
+        loaded = self._load(file_path)
+        if loaded is None:
+            return {}
+        _, data, parsed = loaded
+        return self._context(file_path, data, parsed)
     
-    def _extract_dependencies(self, content: str) -> List[str]:
-        dependencies = []
-        # Look for @Autowired, @Mock, @InjectMocks, etc.
-        autowired_pattern = r'@Autowired\s+(?:public\s+)?(?:static\s+)?(?:final\s+)?(\w+(?:<[^>]+>)?)\s+(\w+)'
-        for match in re.finditer(autowired_pattern, content):
-            dependencies.append({
-                'type': match.group(1),
-                'name': match.group(2),
-                'annotation': 'Autowired'
-            })
-        return dependencies
+    def analyze_files(self, paths: List[Path], workers: Optional[int] = None) -> Dict[Path, Dict]:
+        """Analyze many files across worker processes; later analyze_java_file calls reuse the results"""
+        paths = list(paths)
+        if len(paths) < 2:
+            return {path: self.analyze_java_file(path) for path in paths}
+        # One analyzer per worker process, not per file: its setup is not free
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(str(self.source_path),)) as executor:
+            loaded = list(executor.map(_analyze_one, paths, chunksize=16))
+        results = {}
+        for path, result in zip(paths, loaded):
+            if result is None:
+                results[path] = {}
+                continue
+            stat_key, data, parsed = result
+            _STAT_MEMO[stat_key] = (data, parsed)
+            results[path] = self._context(path, data, parsed)
+        return results
     
-    def _extract_spring_annotations(self, content: str) -> List[str]:
-        spring_annotations = []
-        spring_patterns = [
-            r'@Service', r'@Repository', r'@Controller', r'@RestController',
-            r'@Component', r'@Configuration', r'@Entity', r'@Table'
-        ]
-        for pattern in spring_patterns:
-            if re.search(pattern, content):
-                spring_annotations.append(pattern[1:])  # Remove @
-        return spring_annotations
+    def _parse_content(self, content) -> Dict:
+        """Extract everything that depends only on the file content"""
+        content = _as_bytes(content)
+        # One pass up front instead of guarding every regex against comments and strings
+        sanitized = _strip_comments_and_literals(content)
+        declarations = _scan_declarations(sanitized)
+        # The syntax tree gets generics with commas, multi-line signatures and
+        # keywords inside strings right; the regexes are the fallback
+        members = _ts_members(content) or {
+            'fields': _extract_fields(sanitized),
+            'constructors': _extract_constructors(sanitized),
+            'methods': _extract_methods(sanitized),
+        }
+        return {
+            'package': declarations['package'],
+            'imports': declarations['imports'],
+            'class_name': declarations['class_name'],
+            'extends': declarations['extends'],
+            'implements': declarations['implements'],
+            'annotations': declarations['annotations'],
+            # Members are kept as parallel lists (one per attribute) rather
+            # than a dict per entry: far smaller in memory and in the cache
+            **dict(zip(('field_types', 'field_names'), _unique_rows(*members['fields']))),
+            **dict(zip(
+                ('constructor_names', 'constructor_param_types', 'constructor_param_names'),
+                _unique_rows(*members['constructors']),
+            )),
+            **dict(zip(
+                ('method_return_types', 'method_names', 'method_param_types', 'method_param_names'),
+                _unique_rows(*members['methods']),
+            )),
+            'dependencies': declarations['dependencies'],
+            'spring_annotations': declarations['spring_annotations'],
+        }
     
     def _find_model_classes(self, content: str) -> List[str]:
         # Look for model/entity classes in the same package
-        model_classes = []
-        package = self._extract_package(content)
-        if package:
-            models_dir = self.source_path / package.replace('.', '/') / 'models'
-            if models_dir.exists():
-                for model_file in models_dir.glob('*.java'):
-                    model_content = model_file.read_text(encoding='utf-8')
-                    class_name = self._extract_class_name(model_content)
-                    if class_name:
-                        model_classes.append(class_name)
-        return model_classes
+        return self._model_classes_for_package(_extract_package(content))
+    
+    def _model_classes_for_package(self, package: str) -> List[str]:
+        if not package:
+            return []
+        return list(_model_classes_in(str(self.source_path / package.replace('.', '/') / 'models')))
+    
+    def generate_json_context(self, java_file: Path) -> str:
+        """Compact JSON of the analyzed context; a fraction of the prompt tokens of the human-readable text"""
+        context = self.analyze_java_file(java_file)
+        if not context:
+            return "{}"
+        # Resolve the lazy model-class lookup so it is serialized too
+        return json.dumps(dict(context, model_classes=context['model_classes']), separators=(',', ':'), ensure_ascii=False)
     
     def generate_comprehensive_context(self, java_file: Path) -> str:
         """Generate comprehensive context for AI test generation"""
+        buf = io.StringIO()
+        self.write_comprehensive_context(java_file, buf)
+        return buf.getvalue()
+    
+    def write_comprehensive_context(self, java_file: Path, out) -> None:
+        """Write comprehensive context for AI test generation to a text stream"""
         context = self.analyze_java_file(java_file)
         
-        # Read the actual file content to get more accurate information
-        try:
-            file_content = java_file.read_text(encoding='utf-8')
-        except Exception as e:
-            file_content = f"Error reading file: {e}"
+        # Reuse the bytes analyze_java_file already read; this is the only full decode
+        raw = self.content_cache.get(java_file)
+        if raw is not None:
+            # Same newline translation read_text() would apply
+            file_content = _text(raw).replace('\r\n', '\n').replace('\r', '\n')
+        else:
+            try:
+                file_content = java_file.read_text(encoding='utf-8')
+            except Exception as e:
+                file_content = f"Error reading file: {e}"
         
-        context_text = f"""
+        out.write(f"""
 COMPREHENSIVE JAVA CONTEXT FOR TEST GENERATION
 ==============================================
 
@@ -190,44 +748,54 @@ ANNOTATIONS:
 - Spring Annotations: {', '.join(context.get('spring_annotations', []))}
 
 CONSTRUCTORS (EXACT SIGNATURES):
-"""
+""")
         
-        for constructor in context.get('constructors', []):
-            params = ', '.join([f"{p['type']} {p['name']}" for p in constructor['parameters']])
-            context_text += f"- {constructor['name']}({params})\n"
+        out.writelines(
+            f"- {name}({_format_params(ptypes, pnames)})\n"
+            for name, ptypes, pnames in zip(
+                context.get('constructor_names', []),
+                context.get('constructor_param_types', []),
+                context.get('constructor_param_names', []),
+            )
+        )
         
-        context_text += f"""
+        out.write(f"""
 FIELDS (EXACT TYPES AND NAMES):
-"""
-        for field in context.get('fields', []):
-            context_text += f"- {field['type']} {field['name']}\n"
+""")
+        out.writelines(
+            f"- {ftype} {fname}\n"
+            for ftype, fname in zip(context.get('field_types', []), context.get('field_names', []))
+        )
         
-        context_text += f"""
+        out.write(f"""
 METHODS (EXACT SIGNATURES):
-"""
-        for method in context.get('methods', []):
-            params = ', '.join([f"{p['type']} {p['name']}" for p in method['parameters']])
-            context_text += f"- {method['return_type']} {method['name']}({params})\n"
+""")
+        out.writelines(
+            f"- {rtype} {name}({_format_params(ptypes, pnames)})\n"
+            for rtype, name, ptypes, pnames in zip(
+                context.get('method_return_types', []),
+                context.get('method_names', []),
+                context.get('method_param_types', []),
+                context.get('method_param_names', []),
+            )
+        )
         
-        context_text += f"""
+        out.write(f"""
 DEPENDENCIES (for mocking):
-"""
-        for dep in context.get('dependencies', []):
-            context_text += f"- {dep['annotation']} {dep['type']} {dep['name']}\n"
+""")
+        out.writelines(f"- {dep['annotation']} {dep['type']} {dep['name']}\n" for dep in context.get('dependencies', []))
         
-        context_text += f"""
+        out.write(f"""
 IMPORTS (for reference):
-"""
-        for imp in context.get('imports', []):
-            context_text += f"- {imp}\n"
+""")
+        out.writelines(f"- {imp}\n" for imp in context.get('imports', []))
         
-        context_text += f"""
+        out.write(f"""
 MODEL CLASSES (for test data creation):
-"""
-        for model in context.get('model_classes', []):
-            context_text += f"- {model}\n"
+""")
+        out.writelines(f"- {model}\n" for model in context.get('model_classes', []))
         
-        context_text += f"""
+        out.write(f"""
 CRITICAL TEST GENERATION RULES:
 1. Use the EXACT constructor signatures shown above - NO parameterized constructors unless explicitly shown
 2. Use the EXACT method names shown above - follow camelCase convention
@@ -248,23 +816,64 @@ SPRING BOOT SPECIFIC NOTES:
 - Mock repositories with @MockBean or @Mock
 - Use @ExtendWith(MockitoExtension.class) for unit tests
 - Do NOT use @SpringBootTest for unit tests - use @ExtendWith(MockitoExtension.class)
-"""
+""")
         
-        return context_text
+
+# The analyzer each analyze_files worker process reuses for all of its files
+_worker_analyzer = None
+
+
+def _init_worker(source_path: str) -> None:
+    global _worker_analyzer
+    _worker_analyzer = JavaContextAnalyzer(source_path)
+
+
+def _analyze_one(file_path: Path) -> Optional[Tuple[tuple, bytes, Dict]]:
+    """Worker for JavaContextAnalyzer.analyze_files; the disk cache is shared across processes"""
+    return _worker_analyzer._load(file_path)
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate comprehensive Java context for AI test generation",
+    )
+    parser.add_argument("java_file", nargs="?", type=Path, help="Java source file (single-file mode)")
+    parser.add_argument("output_file", nargs="?", type=Path, help="Output path (single-file mode)")
+    parser.add_argument(
+        "--java",
+        type=Path,
+        action="append",
+        default=[],
+        help="Java source file; repeat to analyze many files with one analyzer (requires --out-dir)",
+    )
+    parser.add_argument("--out-dir", type=Path, help="Directory for <ClassName>_context.txt outputs in batch mode")
+    parser.add_argument(
+        "--source-path",
+        default="JtProject/src/main/java",
+        help="Source root used to find model classes (default: JtProject/src/main/java)",
+    )
+    args = parser.parse_args(argv)
+    if args.java_file and args.output_file:
+        args.jobs = [(args.java_file, args.output_file)]
+    elif args.java and args.out_dir and not args.java_file:
+        args.jobs = [(java_file, args.out_dir / f"{java_file.stem}_context.txt") for java_file in args.java]
+    else:
+        parser.error("pass <java_file> <output_file>, or one or more --java files with --out-dir")
+    return args
+
 
 def main():
-    if len(os.sys.argv) != 3:
-        print("Usage: python enhanced_context_generator.py <java_file> <output_file>")
-        sys.exit(1)
-    
-    java_file = Path(os.sys.argv[1])
-    output_file = Path(os.sys.argv[2])
-    
-    analyzer = JavaContextAnalyzer("JtProject/src/main/java")
-    context = analyzer.generate_comprehensive_context(java_file)
+    args = parse_args(sys.argv[1:])
     
-    output_file.write_text(context, encoding='utf-8')
-    print(f"Generated comprehensive context for {java_file.name}")
+    # One analyzer for every file keeps its caches warm across the batch
+    analyzer = JavaContextAnalyzer(args.source_path)
+    # Parse the whole batch in parallel up front; writing then only formats
+    analyzer.analyze_files([java_file for java_file, _ in args.jobs])
+    for java_file, output_file in args.jobs:
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_file, 'w', encoding='utf-8') as fh:
+            analyzer.write_comprehensive_context(java_file, fh)
+        print(f"Generated comprehensive context for {java_file.name}")
 
 if __name__ == "__main__":
     main()
@@ -1,161 +1,301 @@
 #!/usr/bin/env python3
 
 import argparse
+import functools
+import hashlib
+import io
+import json
+import mmap
 import os
 import re
+import shutil
 import sys
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional, Tuple
 
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None  # We'll give a helpful error if missing
+# google.generativeai pulls in gRPC and protobuf, so it is only imported once a
+# model is actually needed (not for --print-system or context generation)
+_genai = None
 
 
 SECTION_SYSTEM_HEADING = "🧠 System Prompt for the Agent"
 SECTION_USER_TEMPLATE_HEADING = "📝 User Prompt Template"
 SECTION_SEPARATOR = "⸻"
 
+_SYS_START_RE = re.compile(r"You are an expert Java developer and test automation engineer\.")
+# Every marker extract_system_prompt cares about, found in a single scan of the guide
+_MARKER_RE = re.compile(
+    "(?P<heading>" + re.escape(SECTION_SYSTEM_HEADING) + ")"
+    "|(?P<start>" + _SYS_START_RE.pattern + ")"
+    "|(?P<end>" + "|".join(map(re.escape, (
+        SECTION_USER_TEMPLATE_HEADING, SECTION_SEPARATOR, "🚀 3-Day Build Plan", "💡 Usage in Cursor",
+    ))) + ")"
+)
+_MARKER_BYTES_RE = re.compile(_MARKER_RE.pattern.encode("utf-8"))
+
+# Requests per minute allowed across all callers in this process
+GEN_RPM = max(1, int(os.environ.get("GEN_RPM", "30")))
+GEN_CONCURRENCY = max(1, int(os.environ.get("GEN_CONCURRENCY", "8")))
+# Caches live in the user cache dir so runs never leave files in the checkout
+CACHE_ROOT = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ai-test-generator"
+RESPONSE_CACHE_DIR = Path(os.environ.get("GEMINI_CACHE_DIR") or CACHE_ROOT / "gemini")
+# Oldest responses are evicted once the cache grows past this size
+RESPONSE_CACHE_MAX_BYTES = int(float(os.environ.get("GEMINI_CACHE_MAX_MB", "64")) * 1024 * 1024)
+# Extracted system prompts keyed by SHA-256 of the guide text, shared across runs
+PROMPT_CACHE_FILE = Path(os.environ.get("PROMPT_CACHE_FILE") or CACHE_ROOT / "prompts.json")
+PROMPT_CACHE_ENTRIES = 8
+# Which source version each generated test came from, for is_generation_current
+GEN_INDEX_FILE = Path(os.environ.get("GEN_INDEX_FILE") or CACHE_ROOT / "generated.json")
+
+
+class RateLimiter:
+    """Spaces API calls evenly at a fixed rate, shared by threads and coroutines"""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Claim the next free slot and return how long to wait for it"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+            return slot - now
+
+    def wait(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def wait_async(self) -> None:
+        import asyncio  # Already loaded by whoever runs the event loop
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+_limiter = RateLimiter(GEN_RPM)
+
 
 def read_text_file(path: str) -> str:
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"File not found: {path}")
-    with open(path, "r", encoding="utf-8") as f:
+    # Open directly rather than stat first: one syscall fewer per file read
+    try:
+        f = open(path, "r", encoding="utf-8")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {path}") from None
+    with f:
         return f.read()
 
 
-def extract_system_prompt(guide_text: str) -> str:
+def _system_prompt_span(guide, marker_re, newlines) -> Tuple[int, int]:
+    """Offsets of the system prompt in guide, which may be a str or a bytes-like such as an mmap"""
+    hits = [(m.start(), m.lastgroup) for m in marker_re.finditer(guide)]
+
     # Find the system section anchor
-    sys_idx = guide_text.find(SECTION_SYSTEM_HEADING)
+    sys_idx = next((pos for pos, kind in hits if kind == "heading"), -1)
     if sys_idx == -1:
-        # Fallback: directly search for the known first line of the system prompt
-        m = re.search(r"^You are an expert Java developer and test automation engineer\..*", guide_text, re.M | re.S)
-        if not m:
+        # Fallback: the known first line of the system prompt, at the start of a line.
+        # Reuses the hits above, so there is no second scan of the guide and no
+        # re.M pass; a quoted mid-line mention of the sentence is still skipped
+        start = next((pos for pos, kind in hits
+                      if kind == "start" and (pos == 0 or guide[pos - 1] in newlines)), -1)
+        if start == -1:
             raise ValueError("Could not locate the System Prompt section in PROMPT_GUIDE.md")
-        start = m.start()
     else:
         # From the heading, locate the line that starts the actual prompt ("You are an expert ...")
-        after_heading = guide_text[sys_idx:]
-        m = re.search(r"You are an expert Java developer and test automation engineer\..*", after_heading, re.S)
-        if not m:
+        start = next((pos for pos, kind in hits if kind == "start" and pos > sys_idx), -1)
+        if start == -1:
             raise ValueError("System Prompt heading found but prompt body not detected.")
-        start = sys_idx + m.start()
 
-    # Determine the end boundary: next section heading or separator
-    candidates = []
-    for marker in (SECTION_USER_TEMPLATE_HEADING, SECTION_SEPARATOR, "🚀 3-Day Build Plan", "💡 Usage in Cursor"):
-        idx = guide_text.find(marker, start + 1)
-        if idx != -1:
-            candidates.append(idx)
-    end = min(candidates) if candidates else len(guide_text)
+    # Determine the end boundary: the earliest next section heading or separator
+    end = next((pos for pos, kind in hits if kind == "end" and pos > start), len(guide))
+    return start, end
 
-    system_prompt = guide_text[start:end].strip()
 
-    # Ensure the prompt begins with the expected opening sentence for clarity
-    if not system_prompt.startswith("You are an expert Java developer"):
-        # Try to trim leading lines before that sentence
-        m2 = re.search(r"You are an expert Java developer and test automation engineer\..*", system_prompt, re.S)
-        if m2:
-            system_prompt = system_prompt[m2.start():].strip()
+def extract_system_prompt(guide_text: str) -> str:
+    start, end = _system_prompt_span(guide_text, _MARKER_RE, ("\n",))
+    return _checked_system_prompt(guide_text[start:end].strip())
 
-    if not system_prompt:
-        raise ValueError("Extracted system prompt is empty.")
+
+def _checked_system_prompt(system_prompt: str) -> str:
+    # start is the opening sentence itself, so there is nothing left to trim; this
+    # also rules out an empty prompt
+    if not system_prompt.startswith("You are an expert Java developer"):
+        raise ValueError("Extracted system prompt does not start with the expected opening sentence.")
     return system_prompt
 
 
-def build_user_prompt(java_code: str, context_file: str = None) -> str:
-    # Mirrors the User Prompt Template in PROMPT_GUIDE.md
-    context_section = ""
-    if context_file and os.path.exists(context_file):
-        with open(context_file, 'r', encoding='utf-8') as f:
-            context_section = f"\n\nENHANCED CONTEXT:\n{f.read()}\n"
-    
-    return (
-        "Generate a JUnit5 + Mockito test class for the following Java code. "
-        "Follow the system instructions provided.\n\n"
-        "Java code:\n"
-        f"{java_code}\n"
-        f"{context_section}"
-        "END.\n\n"
-        "CRITICAL REQUIREMENTS - READ CAREFULLY:\n"
-        "1. CONSTRUCTOR USAGE: Use NO-ARGS constructor + setters for JPA entities. Do NOT use parameterized constructors unless explicitly shown in the ENHANCED CONTEXT.\n"
-        "   - WRONG: new Category(1, \"name\")\n"
-        "   - CORRECT: new Category(); category.setId(1); category.setName(\"name\")\n"
-        "2. METHOD NAMES: Use EXACT method names from the ENHANCED CONTEXT - follow camelCase convention (e.g., setCartId, not setCart_id).\n"
-        "3. TYPE SAFETY: Use EXACT types from the ENHANCED CONTEXT - no type conversions (e.g., use int, not long).\n"
-        "   - CRITICAL: Check field types in the ENHANCED CONTEXT before setting values\n"
-        "   - If field is 'private int price', use setPrice(10) NOT setPrice(10.0)\n"
-        "   - If field is 'private double price', use setPrice(10.0) NOT setPrice(10)\n"
-        "   - If field is 'private String name', use setName(\"value\") NOT setName(123)\n"
-        "4. IMPORTS: Include ALL necessary imports - check the IMPORTS section in ENHANCED CONTEXT.\n"
-        "5. MOCKITO: For Mockito.thenReturn(), ensure return types are Serializable or use proper mocking patterns.\n"
-        "6. SPRING BOOT: Use @ExtendWith(MockitoExtension.class) for unit tests, NOT @SpringBootTest.\n"
-        "7. JPA ENTITIES: For @Entity classes, use no-args constructor + setters pattern.\n"
-        "8. MOCKING: Mock all @Autowired, @Repository, @Service dependencies with @Mock.\n"
-        "9. COMPILATION: The generated test MUST compile without errors. Check for:\n"
-        "   - Missing semicolons\n"
-        "   - Incorrect method calls\n"
-        "   - Missing imports\n"
-        "   - Type conversion errors (double to int, etc.)\n"
-        "   - Syntax errors\n"
-        "   - Missing class references\n"
-        "10. PACKAGE: Use the same package as the source class.\n"
-        "11. Do not make any assumptions about code. Verify if the fucntion you are calling even exists or not.\n"
-        "12. DATABASE MOCKING: For Spring Boot Application tests, use @MockBean to mock database connections and prevent real DB calls.\n"
-        "13. NO REAL DATABASE: Never let tests connect to real databases - always mock database dependencies.\n"
-        "14. JtSpringProjectApplication TESTS: DO NOT call SpringApplication.run() directly - mock all dependencies instead.\n"
-        "15. USE @ExtendWith(MockitoExtension.class) for unit tests, NOT @SpringBootTest for database-dependent tests.\n\n"
-        "CRITICAL OUTPUT FORMAT:\n"
-        "- Generate ONLY the Java test code\n"
-        "- Do NOT wrap code in markdown code blocks (```java ... ```)\n"
-        "- Do NOT include any markdown formatting\n"
-        "- Start directly with package declaration\n"
-        "- End with the closing brace of the class\n\n"
-        "Important final reminders for the generator:\n"
-        "- Do NOT change business logic. If you think business logic is wrong, add a one-line `// NOTE:` at the top explaining the concern, then still generate tests assuming current behavior.\n"
-        "- Mock repositories or external API calls — create @Mock fields and necessary stubs.\n"
-        "- Do NOT use Mockito for simple POJOs with no external dependencies; instantiate directly.\n"
-        "- Use `org.mockito.junit.jupiter.MockitoExtension` for @ExtendWith import; do not use `org.mockito.MockitoExtension`.\n"
-        "- When using MockitoExtension, do NOT call MockitoAnnotations.openMocks.\n"
-        "- Respect Java int overflow semantics; avoid impossible assertions like `Integer.MAX_VALUE + 1`.\n"
-        "- If accessing private methods is required, use reflection and comment that reflection is used.\n"
-        "- Before generating tests, include a brief comment block at the top with:\n"
-        "  - A 1–2 line summary of code flow\n"
-        "  - The branches/scenarios you will cover\n"
-        "- Ensure the produced Java file compiles (imports, package, class name, annotations).\n"
-        "- Output ONLY the Java test file content with no Markdown fences or backticks.\n"
-        "- Use the ENHANCED CONTEXT above to understand the exact class structure, constructors, and dependencies.\n"
-        "- DOUBLE-CHECK: Verify all method calls, constructor usage, and imports match the ENHANCED CONTEXT exactly.\n"
-        "\n"
-        "🚨 CRITICAL COMPILATION VALIDATION:\n"
-        "Before returning the code, verify it will compile by checking for:\n"
-        "- Missing semicolons\n"
-        "- Incorrect method calls\n"
-        "- Missing imports (CategoryRepository, CategoryService, etc.)\n"
-        "- Type conversion errors (double to int, etc.)\n"
-        "- Syntax errors\n"
-        "- Missing class references\n"
-        "- All imports must exist in the project\n"
-        "- All method calls must exist in the actual classes\n"
-        "- All types must match exactly (int not double, String not Object)\n"
-        "\n"
-        "🔍 TYPE CHECKING VALIDATION:\n"
-        "- For each setter call, verify the parameter type matches the field type\n"
-        "- If field is 'private int price', use setPrice(10) NOT setPrice(10.0)\n"
-        "- If field is 'private double price', use setPrice(10.0) NOT setPrice(10)\n"
-        "- If field is 'private String name', use setName(\"value\") NOT setName(123)\n"
-        "- If field is 'private boolean active', use setActive(true) NOT setActive(1)\n"
-        "\n"
-        "🚨 CRITICAL: If you cannot verify the code will compile, DO NOT generate it. Ask for clarification instead.\n"
-    )
+def _extract_system_prompt_bytes(guide) -> str:
+    """extract_system_prompt on raw guide bytes; only the prompt slice is ever decoded"""
+    start, end = _system_prompt_span(guide, _MARKER_BYTES_RE, (ord("\n"), ord("\r")))
+    # Same newlines a text-mode read of the whole file would have produced
+    text = bytes(guide[start:end]).decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    return _checked_system_prompt(text.strip())
+
+
+def _load_cached_system_prompt(guide, write_cache: bool = True) -> str:
+    """Extract the system prompt from raw guide bytes, reusing the result an earlier run stored for the same bytes"""
+    digest = hashlib.sha256(guide).hexdigest()
+    try:
+        with open(PROMPT_CACHE_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    if not isinstance(cache, dict):
+        cache = {}
+    prompt = cache.get(digest)
+    if isinstance(prompt, str):
+        return prompt
+    prompt = _extract_system_prompt_bytes(guide)
+    if not write_cache:
+        return prompt
+    cache[digest] = prompt
+    # Keep only the most recent guides; older entries are dropped in insertion order
+    cache = dict(list(cache.items())[-PROMPT_CACHE_ENTRIES:])
+    try:
+        PROMPT_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(PROMPT_CACHE_FILE)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp, PROMPT_CACHE_FILE)
+    except OSError as e:
+        print(f"Could not write prompt cache {PROMPT_CACHE_FILE}: {e}")
+    return prompt
+
+
+@functools.lru_cache(maxsize=4)
+def _load_system_prompt(guide_path: str, mtime_ns: int, write_cache: bool) -> str:
+    # Hash and scan the mapped file directly instead of reading and decoding all of it
+    with open(guide_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return _load_cached_system_prompt(b"", write_cache)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as guide:
+            return _load_cached_system_prompt(guide, write_cache)
+
+
+def load_system_prompt(guide_path: str, write_cache: bool = True) -> str:
+    """Read and extract the system prompt, re-parsing the guide only when it changes.
+
+    With write_cache=False a newly extracted prompt is not stored on disk (read-only queries).
+    """
+    try:
+        mtime_ns = os.stat(guide_path).st_mtime_ns
+    except OSError:
+        raise FileNotFoundError(f"File not found: {guide_path}")
+    return _load_system_prompt(guide_path, mtime_ns, write_cache)
+
+
+# The instructions around the code never change, so they are built once
+_USER_PROMPT_PREFIX = (
+    "Generate a JUnit5 + Mockito test class for the following Java code. "
+    "Follow the system instructions provided.\n\n"
+    "Java code:\n"
+)
+_JSON_CONTEXT_HEADING = "\n\nENHANCED CONTEXT (JSON):\n"
+_TEXT_CONTEXT_HEADING = "\n\nENHANCED CONTEXT:\n"
+_USER_PROMPT_SUFFIX = (
+    "END.\n\n"
+    "CRITICAL REQUIREMENTS - READ CAREFULLY:\n"
+    "1. CONSTRUCTOR USAGE: Use NO-ARGS constructor + setters for JPA entities. Do NOT use parameterized constructors unless explicitly shown in the ENHANCED CONTEXT.\n"
+    "   - WRONG: new Category(1, \"name\")\n"
+    "   - CORRECT: new Category(); category.setId(1); category.setName(\"name\")\n"
+    "2. METHOD NAMES: Use EXACT method names from the ENHANCED CONTEXT - follow camelCase convention (e.g., setCartId, not setCart_id).\n"
+    "3. TYPE SAFETY: Use EXACT types from the ENHANCED CONTEXT - no type conversions (e.g., use int, not long).\n"
+    "   - CRITICAL: Check field types in the ENHANCED CONTEXT before setting values\n"
+    "   - If field is 'private int price', use setPrice(10) NOT setPrice(10.0)\n"
+    "   - If field is 'private double price', use setPrice(10.0) NOT setPrice(10)\n"
+    "   - If field is 'private String name', use setName(\"value\") NOT setName(123)\n"
+    "4. IMPORTS: Include ALL necessary imports - check the imports listed in the ENHANCED CONTEXT.\n"
+    "5. MOCKITO: For Mockito.thenReturn(), ensure return types are Serializable or use proper mocking patterns.\n"
+    "6. SPRING BOOT: Use @ExtendWith(MockitoExtension.class) for unit tests, NOT @SpringBootTest.\n"
+    "7. JPA ENTITIES: For @Entity classes, use no-args constructor + setters pattern.\n"
+    "8. MOCKING: Mock all @Autowired, @Repository, @Service dependencies with @Mock.\n"
+    "9. COMPILATION: The generated test MUST compile without errors. Check for:\n"
+    "   - Missing semicolons\n"
+    "   - Incorrect method calls\n"
+    "   - Missing imports\n"
+    "   - Type conversion errors (double to int, etc.)\n"
+    "   - Syntax errors\n"
+    "   - Missing class references\n"
+    "10. PACKAGE: Use the same package as the source class.\n"
+    "11. Do not make any assumptions about code. Verify if the fucntion you are calling even exists or not.\n"
+    "12. DATABASE MOCKING: For Spring Boot Application tests, use @MockBean to mock database connections and prevent real DB calls.\n"
+    "13. NO REAL DATABASE: Never let tests connect to real databases - always mock database dependencies.\n"
+    "14. JtSpringProjectApplication TESTS: DO NOT call SpringApplication.run() directly - mock all dependencies instead.\n"
+    "15. USE @ExtendWith(MockitoExtension.class) for unit tests, NOT @SpringBootTest for database-dependent tests.\n\n"
+    "CRITICAL OUTPUT FORMAT:\n"
+    "- Generate ONLY the Java test code\n"
+    "- Do NOT wrap code in markdown code blocks (```java ... ```)\n"
+    "- Do NOT include any markdown formatting\n"
+    "- Start directly with package declaration\n"
+    "- End with the closing brace of the class\n\n"
+    "Important final reminders for the generator:\n"
+    "- Do NOT change business logic. If you think business logic is wrong, add a one-line `// NOTE:` at the top explaining the concern, then still generate tests assuming current behavior.\n"
+    "- Mock repositories or external API calls — create @Mock fields and necessary stubs.\n"
+    "- Do NOT use Mockito for simple POJOs with no external dependencies; instantiate directly.\n"
+    "- Use `org.mockito.junit.jupiter.MockitoExtension` for @ExtendWith import; do not use `org.mockito.MockitoExtension`.\n"
+    "- When using MockitoExtension, do NOT call MockitoAnnotations.openMocks.\n"
+    "- Respect Java int overflow semantics; avoid impossible assertions like `Integer.MAX_VALUE + 1`.\n"
+    "- If accessing private methods is required, use reflection and comment that reflection is used.\n"
+    "- Before generating tests, include a brief comment block at the top with:\n"
+    "  - A 1–2 line summary of code flow\n"
+    "  - The branches/scenarios you will cover\n"
+    "- Ensure the produced Java file compiles (imports, package, class name, annotations).\n"
+    "- Output ONLY the Java test file content with no Markdown fences or backticks.\n"
+    "- Use the ENHANCED CONTEXT above to understand the exact class structure, constructors, and dependencies.\n"
+    "- DOUBLE-CHECK: Verify all method calls, constructor usage, and imports match the ENHANCED CONTEXT exactly.\n"
+    "\n"
+    "🚨 CRITICAL COMPILATION VALIDATION:\n"
+    "Before returning the code, verify it will compile by checking for:\n"
+    "- Missing semicolons\n"
+    "- Incorrect method calls\n"
+    "- Missing imports (CategoryRepository, CategoryService, etc.)\n"
+    "- Type conversion errors (double to int, etc.)\n"
+    "- Syntax errors\n"
+    "- Missing class references\n"
+    "- All imports must exist in the project\n"
+    "- All method calls must exist in the actual classes\n"
+    "- All types must match exactly (int not double, String not Object)\n"
+    "\n"
+    "🔍 TYPE CHECKING VALIDATION:\n"
+    "- For each setter call, verify the parameter type matches the field type\n"
+    "- If field is 'private int price', use setPrice(10) NOT setPrice(10.0)\n"
+    "- If field is 'private double price', use setPrice(10.0) NOT setPrice(10)\n"
+    "- If field is 'private String name', use setName(\"value\") NOT setName(123)\n"
+    "- If field is 'private boolean active', use setActive(true) NOT setActive(1)\n"
+    "\n"
+    "🚨 CRITICAL: If you cannot verify the code will compile, DO NOT generate it. Ask for clarification instead.\n"
+)
+
+
+def build_user_prompt(java_code: str, context_text: str = "", json_context: bool = True) -> str:
+    # Mirrors the User Prompt Template in PROMPT_GUIDE.md; only the code and context vary
+    if not context_text:
+        return "".join((_USER_PROMPT_PREFIX, java_code, "\n", _USER_PROMPT_SUFFIX))
+    heading = _JSON_CONTEXT_HEADING if json_context else _TEXT_CONTEXT_HEADING
+    return "".join((_USER_PROMPT_PREFIX, java_code, "\n", heading, context_text, "\n", _USER_PROMPT_SUFFIX))
+
+
+def load_genai():
+    """Import google.generativeai on first use and share the module afterwards"""
+    global _genai
+    if _genai is None:
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            raise RuntimeError(
+                "google-generativeai is not installed. Install with: pip install google-generativeai"
+            )
+        _genai = genai
+    return _genai
 
 
 def configure_gemini(api_key: str, model_name: str, system_prompt: str):
-    if genai is None:
-        raise RuntimeError(
-            "google-generativeai is not installed. Install with: pip install google-generativeai"
-        )
+    genai = load_genai()
     if not api_key:
         raise RuntimeError(
             "Google API key is missing. Set the environment variable GOOGLE_API_KEY to your key."
@@ -177,9 +317,7 @@ def configure_gemini(api_key: str, model_name: str, system_prompt: str):
     return model
 
 
-def generate_tests(model, user_prompt: str) -> str:
-    # Single-turn generation; callers can add streaming if desired
-    resp = model.generate_content(user_prompt)
+def _response_text(resp) -> str:
     # google-generativeai returns text via .text when using 1.5 models
     if hasattr(resp, "text") and resp.text:
         return resp.text
@@ -191,23 +329,212 @@ def generate_tests(model, user_prompt: str) -> str:
     raise RuntimeError("Model returned no text content.")
 
 
+def generate_tests(model, user_prompt: str) -> str:
+    # Single-turn generation; callers can add streaming if desired
+    _limiter.wait()
+    return _response_text(model.generate_content(user_prompt))
+
+
+def _response_cache_path(model_name: str, system_prompt: str, user_prompt: str) -> Path:
+    key = hashlib.sha256("\x1f".join((model_name, system_prompt, user_prompt)).encode("utf-8")).hexdigest()
+    return RESPONSE_CACHE_DIR / key
+
+
+def _tmp_path(path: Path) -> Path:
+    return path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _prune_response_cache() -> None:
+    """Drop the least recently written responses until the cache fits RESPONSE_CACHE_MAX_BYTES"""
+    try:
+        with os.scandir(RESPONSE_CACHE_DIR) as it:
+            entries = [(e.stat().st_mtime_ns, e.stat().st_size, e.path) for e in it
+                       if e.is_file() and not e.name.endswith(".tmp")]
+    except OSError:
+        return
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= RESPONSE_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def cached_generate_tests(model, model_name: str, system_prompt: str, user_prompt: str,
+                          use_cache: bool = True) -> str:
+    """generate_tests, but an identical (model, system prompt, user prompt) is only sent once"""
+    if not use_cache:
+        return generate_tests(model, user_prompt)
+    path = _response_cache_path(model_name, system_prompt, user_prompt)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        pass
+    text = generate_tests(model, user_prompt)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(path)
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not write response cache {path}: {e}")
+    else:
+        _prune_response_cache()
+    return text
+
+
+def stream_tests(model, user_prompt: str, *outs) -> None:
+    """Write the response to every file-like in outs chunk by chunk, as the model produces it"""
+    _limiter.wait()
+    wrote = False
+    for chunk in model.generate_content(user_prompt, stream=True):
+        try:
+            text = chunk.text
+        except (AttributeError, ValueError):
+            # Chunks without text parts (e.g. only finish metadata)
+            continue
+        if text:
+            for out in outs:
+                out.write(text)
+            wrote = True
+    if not wrote:
+        raise RuntimeError("Model returned no text content.")
+
+
+def cached_stream_tests(model, model_name: str, system_prompt: str, user_prompt: str, out,
+                        use_cache: bool = True) -> None:
+    """stream_tests into out, teeing the raw response into the cache (or replaying a cached one)"""
+    if not use_cache:
+        return stream_tests(model, user_prompt, out)
+    path = _response_cache_path(model_name, system_prompt, user_prompt)
+    try:
+        cached = open(path, "r", encoding="utf-8")
+    except OSError:
+        cached = None
+    if cached is not None:
+        with cached:
+            shutil.copyfileobj(cached, out)
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        print(f"Could not write response cache {path}: {e}")
+        return stream_tests(model, user_prompt, out)
+    tmp = _tmp_path(path)
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            stream_tests(model, user_prompt, out, f)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    _prune_response_cache()
+
+
+async def generate_tests_async(model, user_prompt: str) -> str:
+    """Like generate_tests, but awaits the request so several can be in flight at once"""
+    await _limiter.wait_async()
+    return _response_text(await model.generate_content_async(user_prompt))
+
+
+async def generate_many(pairs: List[Tuple[object, str]], concurrency: int = GEN_CONCURRENCY) -> List[object]:
+    """Run (model, prompt) pairs concurrently; results keep input order, failures come back as exceptions"""
+    import asyncio  # Already loaded by whoever runs the event loop
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(model, prompt: str) -> str:
+        async with sem:
+            return await generate_tests_async(model, prompt)
+
+    return await asyncio.gather(*(one(m, p) for m, p in pairs), return_exceptions=True)
+
+
 def strip_markdown_code_fences(text: str) -> str:
     """
     Remove leading/trailing Markdown code fences (``` or ```java) if present.
     Keeps inner content intact. No other transformations.
     """
-    stripped = text.strip()
-    # Leading fence
-    if stripped.startswith("```"):
-        # Drop the first fence line
-        parts = stripped.split("\n", 1)
-        stripped = parts[1] if len(parts) == 2 else ""
+    # Work on indices and slice once at the end instead of copying per step. An
+    # anchored \A\s*```...(.*?)...```\s*\Z regex is far slower on long output:
+    # its lazy body retries the closing-fence tail at every character
+    start, end = 0, len(text)
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    # Leading fence: drop the first fence line
+    if text.startswith("```", start, end):
+        newline = text.find("\n", start, end)
+        start = newline + 1 if newline != -1 else end
     # Trailing fence
-    if stripped.endswith("```"):
-        stripped = stripped[: -3]
-        # Trim one trailing newline that usually precedes the fence
-        stripped = stripped.rstrip()
-    return stripped
+    if text.endswith("```", start, end):
+        end -= 3
+        # Trim the trailing newline that usually precedes the fence
+        while end > start and text[end - 1].isspace():
+            end -= 1
+    return text[start:end]
+
+class TeeWriter:
+    """Minimal file-like that forwards every write to each of outs"""
+
+    def __init__(self, *outs):
+        self.outs = outs
+
+    def write(self, text: str) -> None:
+        for out in self.outs:
+            out.write(text)
+
+
+class FenceStrippingWriter:
+    """
+    File-like wrapper giving the same result as strip_markdown_code_fences on the
+    whole text, for output that arrives in chunks. Only the undecided start (up to
+    the end of a leading fence line) and the trailing whitespace/backtick run are
+    held back; everything else is passed straight through.
+    """
+
+    def __init__(self, out):
+        self.out = out
+        self._head = ""
+        self._state = "head"  # head -> fence (dropping the fence line) -> body
+        self._pending = ""
+
+    def write(self, chunk: str) -> None:
+        if self._state == "head":
+            self._head = (self._head + chunk).lstrip()
+            if len(self._head) < 3 and "```".startswith(self._head):
+                return
+            chunk, self._head = self._head, ""
+            self._state = "fence" if chunk.startswith("```") else "body"
+        if self._state == "fence":
+            newline = chunk.find("\n")
+            if newline == -1:
+                return
+            chunk = chunk[newline + 1:]
+            self._state = "body"
+        data = self._pending + chunk
+        keep = len(data.rstrip().rstrip("`").rstrip())
+        self._pending = data[keep:]
+        self.out.write(data[:keep])
+
+    def close(self) -> None:
+        """Flush what is left once the stream has ended; does not close the wrapped file"""
+        if self._state == "head":
+            # Too short to be a fence
+            self._pending, self._head, self._state = self._head, "", "body"
+        if self._state == "fence":
+            return
+        tail = self._pending.rstrip()
+        if tail.endswith("```"):
+            tail = tail[:-3].rstrip()
+        self._pending = ""
+        self.out.write(tail)
+
 
 def parse_args(argv: list[str]) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -243,19 +570,39 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
         action="store_true",
         help="Print the extracted system prompt and exit (for debugging).",
     )
+    parser.add_argument(
+        "--no-cache",
+        dest="use_cache",
+        action="store_false",
+        help="Always call the model instead of reusing a cached response for an identical prompt.",
+    )
+    parser.add_argument(
+        "--debug-context",
+        action="store_true",
+        help="Also write the enhanced context next to the Java file as <Name>_context.json (or .txt).",
+    )
+    parser.add_argument(
+        "--human-context",
+        action="store_true",
+        help="Send the verbose human-readable context instead of compact JSON (for debugging prompts).",
+    )
     return parser.parse_args(argv)
 
 
 def load_java_input(path: Optional[str]) -> str:
+    # Read bytes and decode once: no text-wrapper buffering or newline translation
     if path:
-        text = read_text_file(path)
+        try:
+            raw = Path(path).read_bytes()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {path}") from None
     else:
         if sys.stdin.isatty():
             raise ValueError(
                 "No --java file provided and no stdin detected. Pipe Java code or use --java <file>."
             )
-        text = sys.stdin.read()
-    text = text.strip()
+        raw = sys.stdin.buffer.read()
+    text = raw.decode("utf-8").strip()
     if not text:
         raise ValueError("Empty Java input.")
     return text
@@ -271,88 +618,199 @@ def write_output(text: str, out_path: Optional[str]) -> None:
             sys.stdout.write("\n")
 
 
-def main(argv: list[str]) -> int:
-    args = parse_args(argv)
-
+def enhanced_context(java_path: str, human_context: bool = False, debug_context: bool = False) -> str:
+    """Analyzer context for one source file; empty when it cannot be generated"""
+    context_text = ""
     try:
-        guide_text = read_text_file(args.guide)
-        system_prompt = extract_system_prompt(guide_text)
+        from enhanced_context_generator import JavaContextAnalyzer
+        analyzer = JavaContextAnalyzer("JtProject/src/main/java")
+        if human_context:
+            context_text = analyzer.generate_comprehensive_context(Path(java_path))
+        else:
+            # The source is already in the prompt; JSON carries the same facts in far fewer tokens
+            context_text = analyzer.generate_json_context(Path(java_path))
     except Exception as e:
-        sys.stderr.write(f"Error reading/parsing guide: {e}\n")
-        return 2
+        print(f"Warning: Could not generate enhanced context: {e}")
+    if context_text and debug_context:
+        # Only kept for inspection; the prompt is built from the returned string
+        context_file = os.path.splitext(java_path)[0] + ("_context.txt" if human_context else "_context.json")
+        with open(context_file, 'w', encoding='utf-8') as f:
+            f.write(context_text)
+    return context_text
+
+
+def generate_for_file(model, system_prompt: str, java_path: str, model_name: str = "",
+                      use_cache: bool = True, *, outs: Tuple = ()) -> str:
+    """Generate a test for one Java file with an already configured model and return its source.
+
+    Lets callers configure Gemini once and loop over files in-process instead of
+    starting generate_tests.py per file. Any file-likes in outs get the test
+    written to them while it is still being generated.
+    """
+    # Same input handling as the CLI, so both send identical prompts and share cache entries
+    java_code = load_java_input(java_path)
+    user_prompt = build_user_prompt(java_code, enhanced_context(java_path))
+    if not model_name:
+        model_name = getattr(model, "model_name", "")
+    if not outs:
+        output = cached_generate_tests(model, model_name, system_prompt, user_prompt, use_cache)
+        return strip_markdown_code_fences(output)
+    buf = io.StringIO()
+    writer = FenceStrippingWriter(TeeWriter(buf, *outs))
+    cached_stream_tests(model, model_name, system_prompt, user_prompt, writer, use_cache)
+    writer.close()
+    return buf.getvalue()
+
+
+def _load_generation_index() -> dict:
+    try:
+        with open(GEN_INDEX_FILE, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return index if isinstance(index, dict) else {}
 
-    if args.print_system:
-        # For quick inspection/debugging
-        sys.stdout.write(system_prompt + "\n")
-        return 0
 
+def is_generation_current(java_path: str, out_path: str) -> bool:
+    """True when out_path is the untouched test generated from java_path at its current mtime"""
+    entry = _load_generation_index().get(os.path.abspath(out_path))
+    if not isinstance(entry, list) or len(entry) != 5:
+        return False
     try:
-        java_code = load_java_input(args.java)
+        source = os.stat(java_path)
+        out = os.stat(out_path)
+        # Both stats must match before the output is worth reading and hashing
+        if [os.path.abspath(java_path), source.st_mtime_ns, out.st_mtime_ns, out.st_size] != entry[:4]:
+            return False
+        with open(out_path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest() == entry[4]
+    except OSError:
+        return False
+
+
+def record_generation(java_path: str, out_path: str, output: str, source_mtime_ns: int) -> None:
+    """Remember which source version produced out_path, for is_generation_current.
+
+    source_mtime_ns is the source's mtime from before generation started, so an
+    edit made while the model was responding is not recorded as covered.
+    """
+    try:
+        out = os.stat(out_path)
+    except OSError:
+        return
+    index = _load_generation_index()
+    index[os.path.abspath(out_path)] = [
+        os.path.abspath(java_path), source_mtime_ns, out.st_mtime_ns, out.st_size,
+        hashlib.sha256(output.encode("utf-8")).hexdigest(),
+    ]
+    try:
+        GEN_INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = _tmp_path(GEN_INDEX_FILE)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, GEN_INDEX_FILE)
+    except OSError as e:
+        print(f"Could not write generation index {GEN_INDEX_FILE}: {e}")
+
+
+def generate(java_path: Optional[str], out_path: Optional[str], model_name: str, guide_path: str,
+             api_key: Optional[str] = None, use_cache: bool = True,
+             debug_context: bool = False, human_context: bool = False) -> Tuple[int, str]:
+    """Generate a test for one Java file; returns (exit code, error message) like the CLI would"""
+    try:
+        system_prompt = load_system_prompt(guide_path)
     except Exception as e:
-        sys.stderr.write(f"Error reading Java input: {e}\n")
-        return 2
+        return 2, f"Error reading/parsing guide: {e}\n"
 
-    # Generate enhanced context if java file is provided
-    context_file = None
-    if args.java and os.path.exists(args.java):
+    try:
+        java_code = load_java_input(java_path)
+    except Exception as e:
+        return 2, f"Error reading Java input: {e}\n"
+
+    context_text = ""
+    if java_path:
+        # load_java_input has already read it, so the file exists
+        context_text = enhanced_context(java_path, human_context, debug_context)
+
+    user_prompt = build_user_prompt(java_code, context_text, json_context=not human_context)
+
+    if api_key is None:
+        api_key = os.environ.get("GOOGLE_API_KEY", "")
+    if out_path:
+        # Write the test as it is generated; a failed run leaves no partial file behind
+        tmp_out = f"{out_path}.{os.getpid()}.tmp"
         try:
-            from enhanced_context_generator import JavaContextAnalyzer
-            analyzer = JavaContextAnalyzer("JtProject/src/main/java")
-            context_file = args.java.replace('.java', '_context.txt')
-            context = analyzer.generate_comprehensive_context(Path(args.java))
-            with open(context_file, 'w', encoding='utf-8') as f:
-                f.write(context)
+            model = configure_gemini(api_key, model_name, system_prompt)
+            with open(tmp_out, "w", encoding="utf-8") as f:
+                writer = FenceStrippingWriter(f)
+                cached_stream_tests(model, model_name, system_prompt, user_prompt, writer, use_cache)
+                writer.close()
+            os.replace(tmp_out, out_path)
         except Exception as e:
-            print(f"Warning: Could not generate enhanced context: {e}")
-
-    user_prompt = build_user_prompt(java_code, context_file)
+            if os.path.exists(tmp_out):
+                os.remove(tmp_out)
+            return 3, f"Error generating tests: {e}\n"
+        return 0, ""
 
     try:
-        model = configure_gemini(args.api_key, args.model, system_prompt)
-        output = generate_tests(model, user_prompt)
+        model = configure_gemini(api_key, model_name, system_prompt)
+        output = cached_generate_tests(model, model_name, system_prompt, user_prompt, use_cache)
         output = strip_markdown_code_fences(output)
     except Exception as e:
-        sys.stderr.write(f"Error generating tests: {e}\n")
-        return 3
+        return 3, f"Error generating tests: {e}\n"
 
     try:
-        write_output(output, args.out)
+        write_output(output, out_path)
     except Exception as e:
-        sys.stderr.write(f"Error writing output: {e}\n")
-        return 2
+        return 2, f"Error writing output: {e}\n"
 
-    return 0
+    return 0, ""
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+
+    if args.print_system:
+        # For quick inspection/debugging
+        try:
+            # A read-only query: leave no cache file behind
+            system_prompt = load_system_prompt(args.guide, write_cache=False)
+        except Exception as e:
+            sys.stderr.write(f"Error reading/parsing guide: {e}\n")
+            return 2
+        sys.stdout.write(system_prompt + "\n")
+        return 0
+
+    code, error = generate(args.java, args.out, args.model, args.guide, args.api_key, args.use_cache,
+                           args.debug_context, args.human_context)
+    if error:
+        sys.stderr.write(error)
+    return code
+
+
+def generate_text_with_prompt(user_prompt: str, use_cache: bool = False) -> str:
+    """Send a fully built prompt to Gemini and return the raw response text.
+
+    Uncached by default: these are error-driven retries, and replaying a stored
+    answer would only repeat the output being fixed.
+    """
+    genai = load_genai()
+    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY", ""))
+    model_name = "gemini-1.5-flash"
+    model = genai.GenerativeModel(model_name)
+    
+    # Generate the test content; generate_tests paces calls to GEN_RPM
+    return cached_generate_tests(model, model_name, "", user_prompt, use_cache)
 
 
 def generate_test_with_prompt(java_file: Path, test_file: Path, enhanced_prompt: str) -> bool:
     """Generate test using an enhanced prompt for error-driven iteration"""
     try:
-        # Read the Java source
-        with open(java_file, 'r') as f:
-            java_code = f.read()
-        
-        # Generate context
-        from enhanced_context_generator import JavaContextAnalyzer
-        analyzer = JavaContextAnalyzer(java_file)
-        context = analyzer.generate_comprehensive_context(java_file)
-        
-        # Use the enhanced prompt instead of the regular one
+        # The enhanced prompt already embeds the source; the context built here was never used
         user_prompt = enhanced_prompt
         
         # Generate the test
-        # Initialize the model
-        if not genai:
-            raise RuntimeError("google-generativeai not installed. Run: pip install google-generativeai")
-        
-        genai.configure(api_key=os.environ.get("GOOGLE_API_KEY", ""))
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        
-        # Generate the test content
-        test_content = generate_tests(model, user_prompt)
-        
-        # Add delay to avoid rate limits
-        import time
-        time.sleep(2)  # Wait 2 seconds between API calls
+        test_content = generate_text_with_prompt(user_prompt)
         
         # Write the test file
         test_file.parent.mkdir(parents=True, exist_ok=True)
@@ -1,60 +1,158 @@
 #!/usr/bin/env python3
 
+import functools
 import os
 import re
 import subprocess
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import Iterator, List, Dict, Tuple, Optional
+
+# Compiled once at import; the extractors run them on every line of a build log
+_FILE_RE = re.compile(r'([^:]+):(\d+):(\d+)')
+_METHOD_RE = re.compile(r'method (\w+)\([^)]*\)')
+_VARIABLE_RE = re.compile(r'variable (\w+) of type ([\w.]+)')
+_CTOR_RE = re.compile(r'constructor (\w+) in class ([\w.]+) cannot be applied to given types;\s*required: no arguments\s*found: ([^;]+)')
+_TYPE_RE = re.compile(r'incompatible types: ([^;]+)')
+_CLASSNAME_RE = re.compile(r'class (\w+) is public, should be declared in a file named (\w+)\.java')
+
+# Logs shorter than this are scanned in-process; worker start-up would cost more
+PARALLEL_MIN_LINES = 10_000
+
+# Classifies a log line in one scan; the group name picks the extractor
+_DISPATCH_RE = re.compile(
+    r'(?P<sym>cannot find symbol)'
+    r'|(?P<ctor>constructor\s+\w+.*cannot be applied)'
+    r'|(?P<typ>incompatible types)'
+    r'|(?P<name>is public, should be declared)'
+)
+
+# Every error shape the fixer knows about, for reference
+ERROR_PATTERNS = {
+    'constructor_error': re.compile(r'constructor (\w+) in class [\w.]+ cannot be applied to given types;\s*required: no arguments\s*found: ([^;]+)'),
+    'method_not_found': re.compile(r'cannot find symbol\s*symbol:\s*method (\w+)\([^)]*\)\s*location: variable (\w+) of type ([\w.]+)'),
+    'type_conversion': _TYPE_RE,
+    'missing_import': re.compile(r'cannot find symbol\s*symbol:\s*class (\w+)'),
+    'class_name_mismatch': _CLASSNAME_RE,
+    'private_access': re.compile(r'(\w+) has private access in ([\w.]+)'),
+    'serializable_error': re.compile(r'no suitable method found for thenReturn\(([\w.]+)\)')
+}
+
+# Fix guidance appended to the context, per error type; filled from the error's fields
+_GUIDANCE = {
+    'constructor_error': """
+CONSTRUCTOR FIX GUIDANCE:
+- Class {class_name} requires no-argument constructor
+- Use: new {class_name}()
+- Then set properties using setters
+- Provided args: {provided_args}
+""",
+    'method_not_found': """
+METHOD FIX GUIDANCE:
+- Method {method} does not exist on {class_type}
+- Check correct method name (camelCase)
+- Common setters: setCartId(), setCategoryId(), setProductId()
+- Common getters: getCartId(), getCategoryId(), getProductId()
+""",
+    'type_conversion': """
+TYPE CONVERSION FIX GUIDANCE:
+- Issue: {conversion}
+- Use explicit casting: (int) longValue
+- Or use correct type: Long instead of Integer
+""",
+    'class_name_mismatch': """
+CLASS NAME FIX GUIDANCE:
+- Class name: {actual_class}
+- Expected: {expected_class}
+- Fix: Rename class to match filename
+""",
+}
+
+@functools.lru_cache(maxsize=128)
+def _read_text(path: str, mtime_ns: int) -> str:
+    """Read a file once per modification; a log usually has many errors in the same file"""
+    return Path(path).read_text(encoding='utf-8')
+
+def _read_or_none(path: Path) -> Optional[str]:
+    """_read_text for a path, or None when it cannot be read"""
+    try:
+        return _read_text(str(path), path.stat().st_mtime_ns)
+    except:
+        return None
+
+def _line_window(content: str, start: int, stop: int) -> List[str]:
+    """content.split('\n')[start:stop] without splitting the rest of the file"""
+    pos = 0
+    for _ in range(start):
+        pos = content.find('\n', pos) + 1
+        if not pos:
+            return []
+    window = []
+    while len(window) < stop - start:
+        newline = content.find('\n', pos)
+        if newline == -1:
+            window.append(content[pos:])
+            break
+        window.append(content[pos:newline])
+        pos = newline + 1
+    return window
 
 class SurgicalErrorFixer:
     def __init__(self, source_path: str, test_path: str):
         self.source_path = Path(source_path)
         self.test_path = Path(test_path)
-        self.error_patterns = {
-            'constructor_error': r'constructor (\w+) in class [\w.]+ cannot be applied to given types;\s*required: no arguments\s*found: ([^;]+)',
-            'method_not_found': r'cannot find symbol\s*symbol:\s*method (\w+)\([^)]*\)\s*location: variable (\w+) of type ([\w.]+)',
-            'type_conversion': r'incompatible types: ([^;]+)',
-            'missing_import': r'cannot find symbol\s*symbol:\s*class (\w+)',
-            'class_name_mismatch': r'class (\w+) is public, should be declared in a file named (\w+)\.java',
-            'private_access': r'(\w+) has private access in ([\w.]+)',
-            'serializable_error': r'no suitable method found for thenReturn\(([\w.]+)\)'
+        self.error_patterns = ERROR_PATTERNS
+        # Handlers by _DISPATCH_RE group; each gets the line and the one after it (or None)
+        self._handlers = {
+            'sym': self._extract_symbol_error_at,
+            'ctor': lambda line, next_line: self._extract_constructor_error(line),
+            'typ': lambda line, next_line: self._extract_type_error(line),
+            'name': lambda line, next_line: self._extract_class_name_error(line),
         }
     
-    def analyze_compilation_errors(self, error_output: str) -> List[Dict]:
+    def analyze_compilation_errors(self, error_output: str, workers: Optional[int] = None) -> List[Dict]:
         """Analyze compilation errors and extract specific issues"""
-        errors = []
         lines = error_output.split('\n')
+        workers = workers or os.cpu_count() or 1
+        if len(lines) < PARALLEL_MIN_LINES or workers < 2:
+            return self._scan_lines(lines, len(lines))
         
-        for i, line in enumerate(lines):
-            if 'Error:' in line and 'cannot find symbol' in line:
-                # Look ahead for the symbol details
-                if i + 1 < len(lines) and 'symbol:' in lines[i + 1]:
-                    error_info = self._extract_symbol_error(line, lines[i + 1])
-                    if error_info:
-                        errors.append(error_info)
-            
-            elif 'constructor' in line and 'cannot be applied' in line:
-                error_info = self._extract_constructor_error(line)
-                if error_info:
-                    errors.append(error_info)
-            
-            elif 'incompatible types' in line:
-                error_info = self._extract_type_error(line)
-                if error_info:
-                    errors.append(error_info)
-            
-            elif 'class' in line and 'is public, should be declared' in line:
-                error_info = self._extract_class_name_error(line)
-                if error_info:
-                    errors.append(error_info)
+        # Every error is line-local (plus one look-ahead line), so huge logs split
+        # cleanly into chunks that overlap by that one line
+        size = -(-len(lines) // workers)
+        jobs = [(lines[lo:lo + size + 1], min(size, len(lines) - lo)) for lo in range(0, len(lines), size)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return [error for chunk in executor.map(_scan_chunk, jobs) for error in chunk]
+    
+    def _scan_lines(self, lines: List[str], count: int) -> List[Dict]:
+        """Errors starting on the first count lines; lines may run one further for the look-ahead"""
+        errors = []
+        for i in range(count):
+            line = lines[i]
+            # Every extractor needs a file:line:col location; most log noise has no such pair
+            if line.count(':') < 2:
+                continue
+            match = _DISPATCH_RE.search(line)
+            if not match:
+                continue
+            next_line = lines[i + 1] if i + 1 < len(lines) else None
+            error_info = self._handlers[match.lastgroup](line, next_line)
+            if error_info:
+                errors.append(error_info)
         
         return errors
     
+    def _extract_symbol_error_at(self, line: str, next_line: Optional[str]) -> Optional[Dict]:
+        """Symbol errors carry their details on the following line"""
+        if 'Error:' in line and next_line is not None and 'symbol:' in next_line:
+            return self._extract_symbol_error(line, next_line)
+        return None
+    
     def _extract_symbol_error(self, error_line: str, symbol_line: str) -> Optional[Dict]:
         """Extract method not found errors"""
         # Extract file path and line number
-        file_match = re.search(r'([^:]+):(\d+):(\d+)', error_line)
+        file_match = _FILE_RE.search(error_line)
         if not file_match:
             return None
         
@@ -62,8 +160,8 @@ class SurgicalErrorFixer:
         line_num = int(file_match.group(2))
         
         # Extract method name and class
-        method_match = re.search(r'method (\w+)\([^)]*\)', symbol_line)
-        class_match = re.search(r'variable (\w+) of type ([\w.]+)', symbol_line)
+        method_match = _METHOD_RE.search(symbol_line)
+        class_match = _VARIABLE_RE.search(symbol_line)
         
         if method_match and class_match:
             return {
@@ -78,11 +176,11 @@ class SurgicalErrorFixer:
     
     def _extract_constructor_error(self, line: str) -> Optional[Dict]:
         """Extract constructor errors"""
-        file_match = re.search(r'([^:]+):(\d+):(\d+)', line)
+        file_match = _FILE_RE.search(line)
         if not file_match:
             return None
         
-        constructor_match = re.search(r'constructor (\w+) in class ([\w.]+) cannot be applied to given types;\s*required: no arguments\s*found: ([^;]+)', line)
+        constructor_match = _CTOR_RE.search(line)
         if constructor_match:
             return {
                 'type': 'constructor_error',
@@ -96,11 +194,11 @@ class SurgicalErrorFixer:
     
     def _extract_type_error(self, line: str) -> Optional[Dict]:
         """Extract type conversion errors"""
-        file_match = re.search(r'([^:]+):(\d+):(\d+)', line)
+        file_match = _FILE_RE.search(line)
         if not file_match:
             return None
         
-        type_match = re.search(r'incompatible types: ([^;]+)', line)
+        type_match = _TYPE_RE.search(line)
         if type_match:
             return {
                 'type': 'type_conversion',
@@ -112,11 +210,11 @@ class SurgicalErrorFixer:
     
     def _extract_class_name_error(self, line: str) -> Optional[Dict]:
         """Extract class name mismatch errors"""
-        file_match = re.search(r'([^:]+):(\d+):(\d+)', line)
+        file_match = _FILE_RE.search(line)
         if not file_match:
             return None
         
-        class_match = re.search(r'class (\w+) is public, should be declared in a file named (\w+)\.java', line)
+        class_match = _CLASSNAME_RE.search(line)
         if class_match:
             return {
                 'type': 'class_name_mismatch',
@@ -129,21 +227,20 @@ class SurgicalErrorFixer:
     
     def get_targeted_context(self, java_file: Path, error_info: Dict) -> str:
         """Get targeted context for a specific error"""
-        try:
-            content = java_file.read_text(encoding='utf-8')
-        except:
+        return self._targeted_context(java_file, _read_or_none(java_file), error_info)
+    
+    def _targeted_context(self, java_file: Path, content: Optional[str], error_info: Dict) -> str:
+        if content is None:
             return ""
         
         # Extract the specific method/class around the error
-        lines = content.split('\n')
         error_line = error_info.get('line', 0)
         
         # Get context around the error (5 lines before and after)
         start_line = max(0, error_line - 6)
-        end_line = min(len(lines), error_line + 5)
-        context_lines = lines[start_line:end_line]
+        context_lines = _line_window(content, start_line, error_line + 5)
         
-        context = f"""
+        parts = [f"""
 TARGETED ERROR CONTEXT
 =====================
 File: {java_file.name}
@@ -151,55 +248,32 @@ Error Type: {error_info['type']}
 Error Line: {error_line}
 
 RELEVANT CODE CONTEXT:
-"""
+"""]
         for i, line in enumerate(context_lines, start_line + 1):
             marker = ">>> " if i == error_line else "    "
-            context += f"{marker}{i:3d}: {line}\n"
+            parts.append(f"{marker}{i:3d}: {line}\n")
         
         # Add specific guidance based on error type
-        if error_info['type'] == 'constructor_error':
-            context += f"""
-CONSTRUCTOR FIX GUIDANCE:
-- Class {error_info['class_name']} requires no-argument constructor
-- Use: new {error_info['class_name']}()
-- Then set properties using setters
-- Provided args: {error_info['provided_args']}
-"""
-        elif error_info['type'] == 'method_not_found':
-            context += f"""
-METHOD FIX GUIDANCE:
-- Method {error_info['method']} does not exist on {error_info['class_type']}
-- Check correct method name (camelCase)
-- Common setters: setCartId(), setCategoryId(), setProductId()
-- Common getters: getCartId(), getCategoryId(), getProductId()
-"""
-        elif error_info['type'] == 'type_conversion':
-            context += f"""
-TYPE CONVERSION FIX GUIDANCE:
-- Issue: {error_info['conversion']}
-- Use explicit casting: (int) longValue
-- Or use correct type: Long instead of Integer
-"""
-        elif error_info['type'] == 'class_name_mismatch':
-            context += f"""
-CLASS NAME FIX GUIDANCE:
-- Class name: {error_info['actual_class']}
-- Expected: {error_info['expected_class']}
-- Fix: Rename class to match filename
-"""
+        guidance = _GUIDANCE.get(error_info['type'])
+        if guidance:
+            parts.append(guidance.format(**error_info))
         
-        return context
+        return ''.join(parts)
     
     def generate_surgical_fix(self, java_file: Path, test_file: Path, error_info: Dict) -> str:
         """Generate a surgical fix for a specific error"""
         context = self.get_targeted_context(java_file, error_info)
-        
-        # Read the current test file
-        try:
-            test_content = test_file.read_text(encoding='utf-8')
-        except:
-            test_content = ""
-        
+        return self._surgical_prompt(context, _read_or_none(test_file) or "")
+    
+    def iter_fixes(self, java_file: Path, test_file: Path, errors: List[Dict]) -> Iterator[Tuple[Dict, str, str]]:
+        """Yield (error, context, fix prompt) for each error, reading both files only once"""
+        content = _read_or_none(java_file)
+        test_content = _read_or_none(test_file) or ""
+        for error_info in errors:
+            context = self._targeted_context(java_file, content, error_info)
+            yield error_info, context, self._surgical_prompt(context, test_content)
+    
+    def _surgical_prompt(self, context: str, test_content: str) -> str:
         # Create a focused prompt for this specific error
         prompt = f"""
 SURGICAL TEST FIX
@@ -224,6 +298,11 @@ OUTPUT: Provide ONLY the corrected lines or method that fixes the error.
         
         return prompt
 
+def _scan_chunk(job: Tuple[List[str], int]) -> List[Dict]:
+    """Worker for SurgicalErrorFixer.analyze_compilation_errors on large logs"""
+    lines, count = job
+    return SurgicalErrorFixer("", "")._scan_lines(lines, count)
+
 def main():
     if len(sys.argv) != 4:
         print("Usage: python surgical_error_fixer.py <java_file> <test_file> <error_output>")
@@ -237,11 +316,9 @@ def main():
     errors = fixer.analyze_compilation_errors(error_output)
     
     print(f"Found {len(errors)} specific errors:")
-    for error in errors:
+    # Generate a surgical fix for each specific error
+    for error, _context, fix_prompt in fixer.iter_fixes(java_file, test_file, errors):
         print(f"- {error['type']} in {error['file']} at line {error['line']}")
-        
-        # Generate surgical fix for this specific error
-        fix_prompt = fixer.generate_surgical_fix(java_file, test_file, error)
         print(f"\nSURGICAL FIX PROMPT:\n{fix_prompt}\n")
 
 if __name__ == "__main__":
@@ -6,7 +6,6 @@ This will help us validate our fixes before running the full CI pipeline.
 
 import os
 import sys
-import subprocess
 from pathlib import Path
 
 # Add the current directory to Python path
@@ -27,6 +26,15 @@ def test_simple_generation():
     test_output = Path("test_output/CategoryTest.java")
     test_output.parent.mkdir(exist_ok=True)
     
+    from generate_tests import is_generation_current
+    if is_generation_current(str(category_java), str(test_output)):
+        # Same source as last time and the test is untouched: no need to call the model again
+        print(f"⏭️ {category_java} unchanged since the last run; reusing {test_output}")
+        print(f"\n📋 Generated test content:\n{'-'*50}")
+        print(test_output.read_text(encoding='utf-8'))
+        print(f"{'-'*50}")
+        return True
+    
     # Set up environment variables
     os.environ["GOOGLE_API_KEY"] = os.environ.get("GOOGLE_API_KEY", "")
     os.environ["GEN_MODEL"] = "gemini-1.5-pro"
@@ -36,36 +44,31 @@ def test_simple_generation():
         return False
     
     try:
-        # Run the test generation
+        # Generate in-process: no interpreter start-up or guide re-parse per file
+        from generate_tests import configure_gemini, generate_for_file, load_system_prompt, record_generation
         print(f"📝 Generating test for {category_java}")
-        result = subprocess.run([
-            sys.executable,
-            "generate_tests.py",
-            "--guide", "PROMPT_GUIDE.md",
-            "--model", "gemini-1.5-pro",
-            "--java", str(category_java),
-            "--out", str(test_output)
-        ], capture_output=True, text=True, cwd=Path(__file__).parent)
+        system_prompt = load_system_prompt("PROMPT_GUIDE.md")
+        model = configure_gemini(os.environ["GOOGLE_API_KEY"], "gemini-1.5-pro", system_prompt)
+        # Show the test while it is generated instead of after the call returns
+        print(f"\n📋 Generated test content:\n{'-'*50}")
+        source_mtime_ns = category_java.stat().st_mtime_ns
+        # Stream into a temp file and swap it in only once generation succeeded, so a
+        # failed call never truncates the previous test
+        tmp_output = test_output.with_name(f"{test_output.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_output, 'w') as f:
+                content = generate_for_file(model, system_prompt, str(category_java), "gemini-1.5-pro",
+                                            outs=(f, sys.stdout))
+            os.replace(tmp_output, test_output)
+        finally:
+            if tmp_output.exists():
+                tmp_output.unlink()
+        record_generation(str(category_java), str(test_output), content, source_mtime_ns)
+        print(f"\n{'-'*50}")
         
-        if result.returncode == 0:
-            print(f"✅ Test generation successful!")
-            print(f"📄 Generated test saved to: {test_output}")
-            
-            # Read and display the generated test
-            if test_output.exists():
-                with open(test_output, 'r') as f:
-                    content = f.read()
-                print(f"\n📋 Generated test content:\n{'-'*50}")
-                print(content)
-                print(f"{'-'*50}")
-                return True
-            else:
-                print("❌ Test file was not created")
-                return False
-        else:
-            print(f"❌ Test generation failed with return code {result.returncode}")
-            print(f"Error output: {result.stderr}")
-            return False
+        print(f"✅ Test generation successful!")
+        print(f"📄 Generated test saved to: {test_output}")
+        return True
             
     except Exception as e:
         print(f"❌ Exception during test generation: {e}")
@@ -6,7 +6,6 @@ This script will test the scope limiting and simple test generation.
 
 import os
 import sys
-import subprocess
 from pathlib import Path
 
 def test_scope_limiting():
@@ -69,43 +68,51 @@ def test_simple_generation():
         test_output = Path("test_output/CategoryTest.java")
         test_output.parent.mkdir(exist_ok=True)
         
-        result = subprocess.run([
-            sys.executable,
-            "generate_tests.py",
-            "--guide", "PROMPT_GUIDE.md",
-            "--model", "gemini-1.5-pro",
-            "--java", str(category_java),
-            "--out", str(test_output)
-        ], capture_output=True, text=True, cwd=Path(__file__).parent)
-        
-        if result.returncode == 0 and test_output.exists():
+        # Generate in-process instead of starting generate_tests.py
+        sys.path.insert(0, str(Path(__file__).parent))
+        from generate_tests import (configure_gemini, generate_for_file, is_generation_current,
+                                    load_system_prompt, record_generation)
+        if is_generation_current(str(category_java), str(test_output)):
+            # Same source as last time and the test is untouched: check it without calling the model
+            print(f"⏭️ {category_java} unchanged since the last run; reusing {test_output}")
+            content = test_output.read_text(encoding='utf-8')
+        else:
+            system_prompt = load_system_prompt("PROMPT_GUIDE.md")
+            model = configure_gemini(os.environ["GOOGLE_API_KEY"], "gemini-1.5-pro", system_prompt)
+            # The file fills in as the model responds rather than after the call returns
+            source_mtime_ns = category_java.stat().st_mtime_ns
+            # Stream into a temp file and swap it in only once generation succeeded, so a
+            # failed call never truncates the previous test
+            tmp_output = test_output.with_name(f"{test_output.name}.{os.getpid()}.tmp")
+            try:
+                with open(tmp_output, 'w') as f:
+                    content = generate_for_file(model, system_prompt, str(category_java), "gemini-1.5-pro",
+                                                outs=(f,))
+                os.replace(tmp_output, test_output)
+            finally:
+                if tmp_output.exists():
+                    tmp_output.unlink()
+            record_generation(str(category_java), str(test_output), content, source_mtime_ns)
             print("✅ Test generation successful!")
-            
-            # Check the generated test content
-            with open(test_output, 'r') as f:
-                content = f.read()
-            
-            # Check for common issues
-            issues = []
-            if "Category(" in content and "new Category()" not in content:
-                issues.append("Uses parameterized constructor instead of no-args")
-            if "setCart_id" in content:
-                issues.append("Uses snake_case method names")
-            if "long" in content and "int" in content:
-                issues.append("Uses wrong data types")
-            if "NoResultException" in content and "import" not in content:
-                issues.append("Missing imports")
-            
-            if issues:
-                print(f"⚠️ Generated test has issues: {', '.join(issues)}")
-                print("💡 This is expected - we're working on improving the prompts")
-            else:
-                print("🎉 Generated test looks good!")
-            
-            return True
+        
+        # Check for common issues
+        issues = []
+        if "Category(" in content and "new Category()" not in content:
+            issues.append("Uses parameterized constructor instead of no-args")
+        if "setCart_id" in content:
+            issues.append("Uses snake_case method names")
+        if "long" in content and "int" in content:
+            issues.append("Uses wrong data types")
+        if "NoResultException" in content and "import" not in content:
+            issues.append("Missing imports")
+        
+        if issues:
+            print(f"⚠️ Generated test has issues: {', '.join(issues)}")
+            print("💡 This is expected - we're working on improving the prompts")
         else:
-            print(f"❌ Test generation failed: {result.stderr}")
-            return False
+            print("🎉 Generated test looks good!")
+        
+        return True
             
     except Exception as e:
         print(f"❌ Test generation failed with exception: {e}")